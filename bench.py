@@ -0,0 +1,491 @@
+"""
+Benchmarks for the networking and decoding paths.
+Run python bench.py --help to list the available benchmarks.
+"""
+import argparse
+import asyncio
+import glob
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import struct
+import time
+import tracemalloc
+import zlib
+from typing import List
+
+import numpy as np
+
+from connection import Buffer, BufferView, Connection, Stream, read
+from chunks import _encode_longs, read_chunk
+from protocol import Player
+from tick import TICK_NANOS, TickScheduler, tick_scheduler
+from world import decode_chunk
+
+def _frame_packet(packet: bytes) -> bytes:
+    """Prefixes a packet (including its id) with its length"""
+    frame = Buffer()
+    frame.write_varint(len(packet))
+    frame.write(packet)
+    return bytes(frame)
+
+def _frame(p_id: int, size: int) -> bytes:
+    """Builds a length prefixed packet with a body of size zero bytes"""
+    body = Buffer()
+    body.write_varint(p_id)
+    body.write(bytes(size))
+    return _frame_packet(bytes(body))
+
+def _compressed_frame(packet: bytes, threshold: int) -> bytes:
+    """Frames a packet (including its id) in the compressed packet format"""
+    body = Buffer()
+    if len(packet) >= threshold:
+        body.write_varint(len(packet))
+        body.write(zlib.compress(packet))
+    else:
+        body.write_varint(0)
+        body.write(packet)
+
+    frame = Buffer()
+    frame.write_varint(len(body))
+    frame.write(body)
+    return bytes(frame)
+
+def _serve(ports: multiprocessing.Queue, payload: bytes):
+    """Fake server which floods every client with the payload then waits for it to leave"""
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        writer.write(payload)
+        await writer.drain()
+        await reader.read() # wait for the client to hang up
+        writer.close()
+
+    async def main():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0, backlog=4096)
+        ports.put(server.sockets[0].getsockname()[1])
+        await server.serve_forever()
+
+    asyncio.run(main())
+
+def _start_server(payload: bytes):
+    ports = multiprocessing.Queue()
+    server = multiprocessing.Process(target=_serve, args=(ports, payload), daemon=True)
+    server.start()
+    return server, ports.get()
+
+class _BlockingConnection(Stream):
+    """The previous transport: a blocking socket read one field at a time"""
+    def __init__(self, client: socket.socket):
+        self.client = client
+
+    def read(self, num_bytes: int) -> bytearray:
+        result = bytearray()
+
+        while len(result) < num_bytes:
+            msg = self.client.recv(num_bytes - len(result))
+            if len(msg) == 0:
+                raise IOError("Connection must be closed")
+            result.extend(msg)
+
+        return result
+
+    def write(self, msg: bytearray | bytes):
+        self.client.sendall(msg)
+
+def _report(name: str, bots: int, packets: int, cpu: float, wall: float, rate: int):
+    per_packet = cpu / (bots * packets)
+    print(f"{name:>10}: {bots} bots x {packets} packets in {wall:.2f}s wall, "
+          f"{per_packet * 1e6:.1f}us cpu/packet, "
+          f"~{1 / (per_packet * rate):.0f} bots per core at {rate} packets/s per bot")
+
+def bench_transport(bots: int, packets: int, size: int, rate: int):
+    """Compares the cpu cost of receiving packets with the blocking and asyncio transports"""
+    server, port = _start_server(_frame(0x27, size) * packets)
+
+    try:
+        clients = [socket.create_connection(("127.0.0.1", port)) for _ in range(bots)]
+        conns = [_BlockingConnection(client) for client in clients]
+        wall, cpu = time.perf_counter(), time.process_time()
+        for _ in range(packets):
+            # a blocking read stalls the whole loop, so the bots can only take turns
+            for conn in conns:
+                Buffer(conn.read(conn.read_varint())).read_varint()
+        _report("blocking", bots, packets, time.process_time() - cpu,
+                time.perf_counter() - wall, rate)
+        for client in clients:
+            client.close()
+
+        async def player():
+            async with await Connection.create("127.0.0.1", port) as conn:
+                for _ in range(packets):
+                    await read(conn)
+
+        async def main():
+            await asyncio.gather(*(player() for _ in range(bots)))
+
+        wall, cpu = time.perf_counter(), time.process_time()
+        asyncio.run(main())
+        _report("asyncio", bots, packets, time.process_time() - cpu,
+                time.perf_counter() - wall, rate)
+    finally:
+        server.terminate()
+
+def _write_heightmap(buff: Buffer, name: str, height: int):
+    buff.write_ubyte(12) # TAG_Long_Array
+    buff.write_ushort(len(name))
+    buff.write(name.encode("utf-8"))
+    buff.write_int(37) # 256 entries of 9 bits, 7 per long
+    buff.write(_encode_longs(9, np.full(256, height)).astype(">u8").tobytes())
+
+def _write_bitset(buff: Buffer, bits: int):
+    buff.write_varint(1)
+    buff.write_longlong(bits)
+
+def _chunk_payload(seed: int = 0, x: int = 0, z: int = 0) -> bytes:
+    """
+    Builds a level_chunk_with_light packet (including its id) that looks like terrain:
+    varied sections at the bottom of the world and uniform air above.
+    """
+    rng = random.Random(seed)
+    data = Buffer()
+
+    for index in range(24):
+        if index < 8:
+            data.write_short(4096) # block count
+            data.write_ubyte(4) # bits per entry
+            data.write_varint(5)
+            for _ in range(5):
+                data.write_varint(rng.randrange(1, 20000))
+            data.write_varint(256) # 16 entries of 4 bits per long
+            for _ in range(256): # mostly the first palette entry with some variety
+                entries = [0 if rng.random() < 0.85 else rng.randrange(1, 5) for _ in range(16)]
+                data.write_many("Q", sum(entry << (4 * i) for i, entry in enumerate(entries)))
+        else:
+            data.write_short(0)
+            data.write_ubyte(0)
+            data.write_varint(0) # air
+            data.write_varint(0)
+
+        data.write_ubyte(0) # biomes
+        data.write_varint(1)
+        data.write_varint(0)
+
+    packet = Buffer()
+    packet.write_varint(0x28) # minecraft:level_chunk_with_light
+    packet.write_int(x)
+    packet.write_int(z)
+    packet.write_ubyte(0x0a) # heightmaps compound
+    _write_heightmap(packet, "MOTION_BLOCKING", 8 * 16) # every block of the varied sections is solid
+    _write_heightmap(packet, "WORLD_SURFACE", 8 * 16)
+    packet.write_ubyte(0) # TAG_End
+    packet.write_varint(len(data))
+    packet.write(data)
+    packet.write_varint(0) # block entities
+
+    light_sections = (1 << 26) - 1 # every section plus one below and above the world
+    _write_bitset(packet, light_sections) # sky light mask
+    _write_bitset(packet, light_sections) # block light mask
+    _write_bitset(packet, 0) # empty sky light mask
+    _write_bitset(packet, 0) # empty block light mask
+    packet.write_varint(26) # sky light is dark underground and full above
+    for index in range(26):
+        packet.write_varint(2048)
+        packet.write(bytes(2048) if index < 10 else b"\xff" * 2048)
+    packet.write_varint(26) # block light is dark apart from a few light sources
+    for _ in range(26):
+        light = bytearray(2048)
+        start = rng.randrange(2032)
+        light[start:start + 16] = rng.randbytes(16)
+        packet.write_varint(2048)
+        packet.write(light)
+
+    return bytes(packet)
+
+def bench_chunk(packets: int):
+    """Time and memory allocated per decoded level_chunk_with_light packet"""
+    logging.getLogger().setLevel(logging.WARNING)
+    payload = _chunk_payload()
+    print(f"payload: {len(payload)} bytes")
+
+    for name, buffer in (("Buffer", Buffer), ("BufferView", BufferView)):
+        def decode():
+            buff = buffer(payload)
+            buff.read_varint() # packet id
+            return read_chunk(None, buff)
+
+        start = time.perf_counter()
+        for _ in range(packets):
+            decode()
+        elapsed = (time.perf_counter() - start) / packets
+
+        tracemalloc.start()
+        chunk = decode()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        stored = chunk.nbytes
+        for index in range(len(chunk.sections)):
+            chunk.section_blocks(index)
+
+        print(f"{name:>10}: {elapsed * 1e3:.2f}ms per packet, "
+              f"{peak / 1024:.0f} KiB peak allocated while decoding, "
+              f"{stored / 1024:.0f} KiB stored ({chunk.nbytes / 1024:.0f} KiB fully expanded)")
+
+def _load_payloads(directory: str | None, count: int) -> List[bytes]:
+    """Packets recorded by a Player with record set, or synthetic chunks if there are none"""
+    if directory is not None:
+        payloads = []
+        for path in sorted(glob.glob(os.path.join(directory, "*.bin"))):
+            with open(path, "rb") as file:
+                payloads.append(file.read())
+        if payloads:
+            return payloads
+        logging.warning(f"no recorded payloads in {directory}, using synthetic chunks")
+
+    return [_chunk_payload(seed, x=seed) for seed in range(count)]
+
+def bench_decode(seconds: float, directory: str | None, light: bool = False):
+    """Chunks decoded per second over a set of recorded level_chunk_with_light packets"""
+    logging.getLogger().setLevel(logging.WARNING)
+    payloads = _load_payloads(directory, 16)
+    print(f"{len(payloads)} payloads, {sum(map(len, payloads)) / len(payloads) / 1024:.1f} KiB average")
+
+    decoded = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for payload in payloads:
+            buff = BufferView(payload)
+            buff.read_varint() # packet id
+            read_chunk(None, buff, light)
+        decoded += len(payloads)
+    elapsed = time.perf_counter() - start
+
+    print(f"decoded {decoded} chunks in {elapsed:.2f}s: {decoded / elapsed:.0f} chunks/s, "
+          f"{elapsed / decoded * 1e3:.2f}ms per chunk")
+
+def _serve_flood(ports: multiprocessing.Queue, results: multiprocessing.Queue, chunks: int, interval: int):
+    """
+    Fake server which sends every client chunks distinct level_chunk_with_light packets with a
+    keep_alive after every interval of them, and reports how long each keep_alive took to be answered
+    """
+    logging.getLogger().setLevel(logging.WARNING)
+    frames = [bytearray(_frame_packet(_chunk_payload(seed))) for seed in range(16)]
+    clients = 0
+
+    async def read_varint(reader: asyncio.StreamReader) -> int:
+        value, shift = 0, 0
+        while True:
+            byte = (await reader.readexactly(1))[0]
+            value |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                return value
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        nonlocal clients
+        client, clients = clients, clients + 1
+        sent = {}
+        latencies = []
+
+        async def answers():
+            while len(latencies) < chunks // interval:
+                body = await reader.readexactly(await read_varint(reader))
+                if body[0] == 0x1a: # minecraft:keep_alive serverbound
+                    keep_alive_id, = struct.unpack_from(">q", body, 1)
+                    latencies.append(time.perf_counter() - sent[keep_alive_id])
+
+        answering = asyncio.create_task(answers())
+
+        for index in range(chunks):
+            frame = frames[index % len(frames)]
+            # 3 byte length and the packet id come first, then a distinct chunk x for every packet
+            struct.pack_into(">i", frame, 4, client * chunks + index)
+            writer.write(bytes(frame))
+            if index % interval == interval - 1:
+                sent[index] = time.perf_counter()
+                writer.write(_frame_packet(b"\x27" + struct.pack(">q", index))) # minecraft:keep_alive
+            await writer.drain()
+
+        try:
+            await asyncio.wait_for(answering, 30)
+        finally:
+            results.put(latencies)
+            writer.close()
+
+    async def main():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0, backlog=4096)
+        ports.put(server.sockets[0].getsockname()[1])
+        await server.serve_forever()
+
+    asyncio.run(main())
+
+def bench_keepalive(bots: int, chunks: int, interval: int):
+    """Keep alive response latency while every bot is flooded with chunks, decoding inline or on the pool"""
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(decode_chunk(_chunk_payload()[1:])) # start the decode workers before timing
+
+    for name, offload in (("inline", False), ("offload", True)):
+        ports, results = multiprocessing.Queue(), multiprocessing.Queue()
+        server = multiprocessing.Process(target=_serve_flood, args=(ports, results, chunks, interval), daemon=True)
+        server.start()
+        port = ports.get()
+
+        async def player(index: int):
+            bot = Player(f"Bot{index}")
+            bot.offload_chunks = offload
+
+            async with await Connection.create("127.0.0.1", port) as conn:
+                bot.connection = conn
+                conn.batching = True
+                tick_scheduler().add(bot)
+                try:
+                    await bot.clientbound(conn)
+                finally:
+                    tick_scheduler().remove(bot)
+                    await asyncio.gather(*bot.world._tasks, return_exceptions=True)
+                    bot.world.clear()
+
+        async def main():
+            await asyncio.gather(*(player(index) for index in range(bots)), return_exceptions=True)
+
+        try:
+            wall = time.perf_counter()
+            asyncio.run(main())
+            wall = time.perf_counter() - wall
+            latencies = [latency for _ in range(bots) for latency in results.get(timeout=30)]
+        finally:
+            server.terminate()
+
+        p50, p99 = np.percentile(latencies, (50, 99)) * 1e3 if latencies else (0.0, 0.0)
+        print(f"{name:>7}: {bots} bots x {chunks} chunks in {wall:.2f}s, keep alive answered "
+              f"p50={p50:.1f}ms p99={p99:.1f}ms max={max(latencies, default=0) * 1e3:.1f}ms "
+              f"({len(latencies)} of {bots * (chunks // interval)})")
+
+def bench_compression(bots: int, packets: int, threshold: int):
+    """Cpu per bot and bytes on the wire receiving chunks with and without compression"""
+    chunks = [_chunk_payload(seed, x=seed) for seed in range(packets)]
+
+    for name, compression in (("off", -1), ("on", threshold)):
+        if compression < 0:
+            payload = b"".join(_frame_packet(chunk) for chunk in chunks)
+        else:
+            payload = b"".join(_compressed_frame(chunk, compression) for chunk in chunks)
+        server, port = _start_server(payload)
+
+        async def player():
+            async with await Connection.create("127.0.0.1", port) as conn:
+                conn.set_compression(compression)
+                for _ in range(packets):
+                    await read(conn)
+
+        async def main():
+            await asyncio.gather(*(player() for _ in range(bots)))
+
+        try:
+            wall, cpu = time.perf_counter(), time.process_time()
+            asyncio.run(main())
+            cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+        finally:
+            server.terminate()
+
+        print(f"compression {name:>3}: {len(payload) / packets / 1024:.1f} KiB per chunk on the wire, "
+              f"{cpu / bots * 1e3:.1f}ms cpu per bot for {packets} chunks ({wall:.2f}s wall)")
+
+class _Ticker:
+    """Stands in for a player, recording when each of its ticks ran"""
+    def __init__(self):
+        self.times: List[int] = []
+
+    def tick(self, tick: int):
+        self.times.append(time.perf_counter_ns())
+
+    def flush(self):
+        pass
+
+def bench_tick(bots: int, seconds: float):
+    """Cpu and tick jitter of one sleep loop per bot against one scheduler for every bot"""
+    async def sleeping(ticker: _Ticker):
+        while True:
+            ticker.tick(0)
+            ticker.flush()
+            await asyncio.sleep(TICK_NANOS / 1e9)
+
+    async def scheduled(ticker: _Ticker):
+        scheduler.add(ticker)
+        await asyncio.Event().wait()
+
+    for name, run in (("sleep loops", sleeping), ("scheduler", scheduled)):
+        scheduler = TickScheduler()
+        tickers = [_Ticker() for _ in range(bots)]
+
+        async def main():
+            tasks = [asyncio.create_task(run(ticker)) for ticker in tickers]
+            await asyncio.sleep(seconds)
+            for task in tasks:
+                task.cancel()
+            for ticker in tickers:
+                scheduler.remove(ticker)
+
+        wall, cpu = time.perf_counter(), time.process_time()
+        asyncio.run(main())
+        cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+
+        # how far apart the bots' ticks drift, and how far each tick is from the 50ms grid
+        ticks = min(len(ticker.times) for ticker in tickers)
+        times = np.array([ticker.times[:ticks] for ticker in tickers], dtype=np.int64)
+        spread = (times.max(axis=0) - times.min(axis=0)) / 1e6
+        drift = (times[:, -1] - times[:, 0]) / 1e6 - (ticks - 1) * TICK_NANOS / 1e6
+        print(f"{name:>11}: {bots} bots {ticks} ticks, {cpu / wall * 100:.1f}% cpu, bots' ticks spread over "
+              f"p50={np.percentile(spread, 50):.2f}ms max={spread.max():.2f}ms, "
+              f"clock drift {np.abs(drift).max():.1f}ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the legion client")
+    benchmarks = parser.add_subparsers(dest="benchmark", required=True)
+
+    transport = benchmarks.add_parser("transport", help="Bots per core for the packet transport")
+    transport.add_argument("-b", "--bots", type=int, default=200, help="Number of connected bots")
+    transport.add_argument("-p", "--packets", type=int, default=500, help="Packets sent to each bot")
+    transport.add_argument("-s", "--size", type=int, default=64, help="Packet body size in bytes")
+    transport.add_argument("-r", "--rate", type=int, default=50,
+                           help="Packets per second a single idle bot receives")
+
+    chunk = benchmarks.add_parser("chunk", help="Decoding cost of a level_chunk_with_light packet")
+    chunk.add_argument("-p", "--packets", type=int, default=50, help="Packets to decode")
+
+    decode = benchmarks.add_parser("decode", help="Chunks decoded per second")
+    decode.add_argument("-s", "--seconds", type=float, default=5.0, help="How long to decode for")
+    decode.add_argument("--payloads", default=None,
+                        help="Directory of .bin packets saved by a Player with record set")
+    decode.add_argument("--light", action="store_true", help="Also read the light data")
+
+    keepalive = benchmarks.add_parser("keepalive", help="Keep alive latency during a chunk flood")
+    keepalive.add_argument("-b", "--bots", type=int, default=10, help="Number of connected bots")
+    keepalive.add_argument("-c", "--chunks", type=int, default=200, help="Chunks sent to each bot")
+    keepalive.add_argument("-i", "--interval", type=int, default=20, help="Chunks between keep alives")
+
+    compression = benchmarks.add_parser("compression", help="Cost of receiving compressed chunks")
+    compression.add_argument("-b", "--bots", type=int, default=50, help="Number of connected bots")
+    compression.add_argument("-p", "--packets", type=int, default=50, help="Chunks sent to each bot")
+    compression.add_argument("-t", "--threshold", type=int, default=256,
+                             help="Server network-compression-threshold")
+
+    ticks = benchmarks.add_parser("tick", help="Cost of ticking many bots")
+    ticks.add_argument("-b", "--bots", type=int, default=1000, help="Number of ticked bots")
+    ticks.add_argument("-s", "--seconds", type=float, default=5.0, help="How long to tick for")
+
+    args = parser.parse_args()
+
+    if args.benchmark == "transport":
+        bench_transport(args.bots, args.packets, args.size, args.rate)
+    elif args.benchmark == "chunk":
+        bench_chunk(args.packets)
+    elif args.benchmark == "decode":
+        bench_decode(args.seconds, args.payloads, args.light)
+    elif args.benchmark == "keepalive":
+        bench_keepalive(args.bots, args.chunks, args.interval)
+    elif args.benchmark == "compression":
+        bench_compression(args.bots, args.packets, args.threshold)
+    elif args.benchmark == "tick":
+        bench_tick(args.bots, args.seconds)
@@ -0,0 +1,154 @@
+"""Block state registry built from the blocks.json report generated by the server"""
+import json
+import logging
+import os
+from typing import Dict, List
+
+import numpy as np
+
+REPORT_PATH = "./blocks.json"
+CACHE_PATH = "./blocks" # saved as blocks.npy (state table) and blocks.strings (string table)
+
+class BlockRegistry:
+    """
+    Maps every block state id to its block name and properties in O(1).
+    states[state_id] holds the index of the name and of the property string in the string
+    tables, so whole arrays of state ids can be translated with one NumPy gather.
+    """
+    def __init__(self, states: np.ndarray, strings_path: str | None = None,
+                 names: List[str] | None = None, properties: List[str] | None = None):
+        self.states = states # (number of states, 2) uint32 of name index, property index
+        self._strings_path = strings_path
+        self._names = None if names is None else np.array(names, dtype=object)
+        self._properties = None if properties is None else np.array(properties, dtype=object)
+
+    def __len__(self):
+        return len(self.states)
+
+    @classmethod
+    def from_report(cls, path: str = REPORT_PATH) -> "BlockRegistry":
+        """Builds the state table from the blocks.json report"""
+        with open(path, "r") as file:
+            blocks = json.load(file)
+
+        names: List[str] = []
+        properties: Dict[str, int] = {"": 0}
+        rows = []
+
+        for block_name, data in blocks.items():
+            name_parts = block_name.split(":") # [minecraft:, block_name]
+            assert len(name_parts) > 1, "Unsupported version, block names are too small"
+            names.append(name_parts[1])
+
+            for state in data["states"]:
+                props = ",".join(f"{key}={value}" for key, value in state.get("properties", {}).items())
+                rows.append((state["id"], len(names) - 1, properties.setdefault(props, len(properties))))
+
+        states = np.zeros((max(row[0] for row in rows) + 1, 2), dtype=np.uint32)
+        for state_id, name, props in rows:
+            states[state_id] = (name, props)
+
+        return cls(states, names=names, properties=list(properties))
+
+    def save(self, path: str = CACHE_PATH):
+        """Writes the state table as a .npy file and the string tables as one line per string"""
+        np.save(f"{path}.npy", np.ascontiguousarray(self.states))
+
+        with open(f"{path}.strings", "w") as file:
+            file.write(f"{len(self.names_table)} {len(self.properties_table)}\n")
+            file.writelines(f"{string}\n" for string in self.names_table)
+            file.writelines(f"{string}\n" for string in self.properties_table)
+
+    @classmethod
+    def load(cls, path: str = CACHE_PATH) -> "BlockRegistry":
+        """Memory maps a saved state table. The string tables are only read once they are needed"""
+        return cls(np.load(f"{path}.npy", mmap_mode="r"), strings_path=f"{path}.strings")
+
+    @classmethod
+    def open(cls, report: str = REPORT_PATH, cache: str = CACHE_PATH) -> "BlockRegistry":
+        """Loads the cache if it is newer than the report, otherwise rebuilds and saves it"""
+        cached = f"{cache}.npy"
+
+        if os.path.exists(cached) and os.path.exists(f"{cache}.strings") and (
+                not os.path.exists(report) or os.path.getmtime(cached) >= os.path.getmtime(report)):
+            return cls.load(cache)
+
+        logging.info(f"building block registry cache from {report}")
+        registry = cls.from_report(report)
+        registry.save(cache)
+        return registry
+
+    def _load_strings(self):
+        assert self._strings_path is not None, "block registry has no string table"
+
+        with open(self._strings_path, "r") as file:
+            name_count, _ = (int(count) for count in file.readline().split())
+            strings = file.read().split("\n")[:-1]
+
+        self._names = np.array(strings[:name_count], dtype=object)
+        self._properties = np.array(strings[name_count:], dtype=object)
+
+    @property
+    def names_table(self) -> np.ndarray:
+        if self._names is None:
+            self._load_strings()
+        assert self._names is not None
+        return self._names
+
+    @property
+    def properties_table(self) -> np.ndarray:
+        if self._properties is None:
+            self._load_strings()
+        assert self._properties is not None
+        return self._properties
+
+    def name(self, state_id: int) -> str:
+        if not 0 <= state_id < len(self.states):
+            return f"{state_id}"
+
+        return self.names_table[self.states[state_id, 0]]
+
+    def properties(self, state_id: int) -> Dict[str, str]:
+        if not 0 <= state_id < len(self.states):
+            return {}
+
+        props = self.properties_table[self.states[state_id, 1]]
+        return dict(prop.split("=", 1) for prop in props.split(",")) if props else {}
+
+    def names(self, state_ids: np.ndarray) -> np.ndarray:
+        """Block names of a whole array of state ids in one gather"""
+        state_ids = np.asarray(state_ids)
+        valid = (state_ids >= 0) & (state_ids < len(self.states))
+        names = self.names_table[self.states[np.where(valid, state_ids, 0), 0]]
+
+        if not valid.all(): # unknown ids are named by their number like name() does
+            names[~valid] = state_ids[~valid].astype(str)
+
+        return names
+
+    def state_ids(self, name: str) -> np.ndarray:
+        """Every state id of a block e.g. state_ids("oak_log")"""
+        matches = np.flatnonzero(self.names_table == name)
+        if len(matches) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        return np.flatnonzero(self.states[:, 0] == matches[0])
+
+_registry: BlockRegistry | None = None
+_missing = False
+
+def registry() -> BlockRegistry | None:
+    """
+    The registry shared by the whole process, opened on first use.
+    None if neither the cache nor blocks.json exist (generate them with generate.py -r).
+    """
+    global _registry, _missing
+
+    if _registry is None and not _missing:
+        try:
+            _registry = BlockRegistry.open()
+        except FileNotFoundError:
+            logging.warning(f"{REPORT_PATH} not found, block names are unavailable")
+            _missing = True
+
+    return _registry
@@ -0,0 +1,81 @@
+"""
+Chunks per tick requested in chunk_batch_received, sized to how fast chunks are actually decoded.
+Follows the vanilla ChunkBatchSizeCalculator and additionally splits the time the process can
+spend decoding between every bot that is receiving chunks.
+"""
+import time
+import weakref
+
+TICK_BUDGET = 7_000_000 # nanoseconds a bot aims to spend on received chunks per tick, like vanilla
+PROCESS_BUDGET = 40_000_000 # nanoseconds of every 50ms tick the whole process spends decoding
+MIN_CHUNKS_PER_TICK = 0.01 # the server clamps the requested rate to this range
+MAX_CHUNKS_PER_TICK = 64.0
+ACTIVE_SECONDS = 5.0 # bots that started a batch this recently share the process budget
+
+class ProcessChunkLoad:
+    """Decode cost of a chunk averaged over every bot of the process, and who is receiving chunks"""
+    def __init__(self):
+        self.nanos_per_chunk = 2_000_000.0
+        self._weight = 1
+        self._active: "weakref.WeakKeyDictionary[ChunkRateController, float]" = weakref.WeakKeyDictionary()
+
+    def record(self, nanos: float, chunks: int = 1):
+        """Adds the time spent decoding chunks that were not already decoded for another bot"""
+        if chunks <= 0:
+            return
+
+        sample = nanos / chunks
+        self.nanos_per_chunk = (self.nanos_per_chunk * self._weight + sample) / (self._weight + 1)
+        self._weight = min(49, self._weight + 1)
+
+    def started(self, controller: "ChunkRateController"):
+        self._active[controller] = time.monotonic()
+
+    @property
+    def active(self) -> int:
+        since = time.monotonic() - ACTIVE_SECONDS
+        return sum(1 for started in self._active.values() if started >= since)
+
+    def chunks_per_tick(self) -> float:
+        """Fair share of the process budget for one of the bots receiving chunks"""
+        return PROCESS_BUDGET / self.nanos_per_chunk / max(1, self.active)
+
+_load: ProcessChunkLoad | None = None
+
+def chunk_load() -> ProcessChunkLoad:
+    """The decode load shared by every bot of the process"""
+    global _load
+
+    if _load is None:
+        _load = ProcessChunkLoad()
+    return _load
+
+class ChunkRateController:
+    """
+    Times every batch from chunk_batch_start until its last chunk is decoded and keeps a moving
+    average of the nanoseconds a chunk costs this bot, the same way the vanilla client does.
+    """
+    def __init__(self, load: ProcessChunkLoad | None = None):
+        self.load = load or chunk_load()
+        self.nanos_per_chunk = 2_000_000.0
+        self._weight = 1
+        self._started = time.perf_counter_ns()
+
+    def start(self):
+        self._started = time.perf_counter_ns()
+        self.load.started(self)
+
+    def finish(self, batch_size: int):
+        """Called once every chunk of the batch is decoded"""
+        if batch_size <= 0:
+            return
+
+        sample = (time.perf_counter_ns() - self._started) / batch_size
+        # one slow or fast batch moves the average by at most a factor of 3, like vanilla
+        sample = min(max(sample, self.nanos_per_chunk / 3), self.nanos_per_chunk * 3)
+        self.nanos_per_chunk = (self.nanos_per_chunk * self._weight + sample) / (self._weight + 1)
+        self._weight = min(49, self._weight + 1)
+
+    def chunks_per_tick(self) -> float:
+        desired = min(TICK_BUDGET / self.nanos_per_chunk, self.load.chunks_per_tick())
+        return min(max(desired, MIN_CHUNKS_PER_TICK), MAX_CHUNKS_PER_TICK)
@@ -1,119 +1,406 @@
-from typing import List, Tuple 
-from connection import Buffer
-from nbt import read_nbt
+from typing import Dict, List, Tuple 
+from connection import Stream
+from nbt import read_nbt, skip_nbt
+from light import ChunkLight, read_light
+from blocks import BlockRegistry
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import lru_cache
 import numpy as np
 
 logging.getLogger().setLevel(logging.DEBUG)
 np.set_printoptions(threshold=10000)
 
-@dataclass
+MAX_CHUNK_BYTES = 400_000 # expanded sections are packed again past this
+BLOCKS_PER_SECTION = 16 * 16 * 16
+BIOMES_PER_SECTION = 4 * 4 * 4 # one biome per 4x4x4 cell
+MAX_INDIRECT_BLOCK_BITS = 8 # above this the entries are global ids (a direct palette)
+MAX_INDIRECT_BIOME_BITS = 3
+HEIGHTMAPS = ("MOTION_BLOCKING", "WORLD_SURFACE") # decoded into [z][x] arrays of the y above the top block
+AIR = np.array([0], dtype=np.uint16) # minecraft:air, the only air state known without a registry
+
+@lru_cache(maxsize=4)
+def air_ids(registry: BlockRegistry | None) -> np.ndarray:
+    """State ids of every kind of air, which heightmaps skip over"""
+    if registry is None:
+        return AIR
+
+    ids = np.concatenate([registry.state_ids(name) for name in ("air", "cave_air", "void_air")])
+    return ids.astype(np.uint16) if len(ids) else AIR
+
 class ChunkSection:
-    """Contains a list of block ids for a 16x16x16 area"""
-    blocks: np.ndarray 
+    """
+    A 16x16x16 area of blocks kept in the smallest form the server sent it in:
+    a single id for uniform sections, otherwise the packed longs and their palette.
+    blocks expands it to uint16 global ids indexed [y][z][x] the first time it is needed.
+    Biomes are small enough to always be stored expanded, indexed [y][z][x] per 4x4x4 cell.
+    """
+    __slots__ = ("block_count", "value", "bits", "data", "palette", "biomes", "dirty", "version", "_blocks",
+                 "_unpacked")
+
+    def __init__(self, block_count: int = 0, value: int = 0, bits: int = 0,
+                 data: np.ndarray | None = None, palette: np.ndarray | None = None,
+                 biomes: np.ndarray | None = None):
+        self.block_count = block_count # non-air blocks
+        self.value = value # id of every block when bits is 0
+        self.bits = bits # bits per entry of data
+        self.data = data # packed native uint64 longs
+        self.palette = palette # uint16 global id of every data entry, None if data holds global ids
+        self.biomes = np.zeros((4, 4, 4), dtype=np.uint16) if biomes is None else biomes
+        self.dirty = False # set by every change, cleared by whoever consumes the changes
+        self.version = 0 # bumped by every change
+        self._blocks: np.ndarray | None = None
+        self._unpacked = False # _blocks holds changes that value or data do not have yet
+
+    def copy(self) -> "ChunkSection":
+        """
+        A section that can be changed without changing this one. The packed arrays are shared
+        since they are only ever replaced, never written to.
+        """
+        copy = ChunkSection(self.block_count, self.value, self.bits, self.data, self.palette, self.biomes)
+        copy.version = self.version
+        copy._blocks = None if self._blocks is None else self._blocks.copy()
+        copy._unpacked = self._unpacked
+        return copy
+
+    @property
+    def expanded(self) -> bool:
+        return self._blocks is not None
+
+    @property
+    def blocks(self) -> np.ndarray:
+        if self._blocks is None:
+            self._blocks = self.decoded()
+
+        return self._blocks
+
+    def decoded(self) -> np.ndarray:
+        """The same array as blocks, without keeping it expanded afterwards"""
+        if self._blocks is not None:
+            return self._blocks
+        if self.bits == 0:
+            return np.full((16, 16, 16), self.value, dtype=np.uint16)
+
+        assert self.data is not None
+        return _global_ids(self.bits, self.data, self.palette, BLOCKS_PER_SECTION).reshape(16, 16, 16)
+
+    def block_at(self, x: int, y: int, z: int) -> int:
+        """Looks up one block without expanding the section"""
+        if self._blocks is not None:
+            return int(self._blocks[y, z, x])
+        if self.bits == 0:
+            return self.value
+
+        assert self.data is not None
+        index = (y * 16 + z) * 16 + x
+        per_long = 64 // self.bits
+        entry = int(self.data[index // per_long]) >> (index % per_long * self.bits)
+        entry &= (1 << self.bits) - 1
+        return entry if self.palette is None else int(self.palette[entry])
+
+    def set_blocks(self, x: np.ndarray, y: np.ndarray, z: np.ndarray, ids: np.ndarray) -> bool:
+        """
+        Sets many blocks at once from arrays of section relative positions, the last entry
+        wins for repeated positions. Returns whether any block changed.
+        This expands the section, chunks go through Chunk.set_blocks to stay within their budget.
+        """
+        blocks = self.blocks
+        ids = np.asarray(ids, dtype=np.uint16)
+        changed = blocks[y, z, x] != ids
+        if not changed.any():
+            return False
+
+        before = blocks[y, z, x]
+        blocks[y, z, x] = ids
+        self._unpacked = True
+        # air is state 0, the count only drives whether a section needs to be looked at
+        self.block_count += int(np.count_nonzero(before[changed] == 0)) - int(np.count_nonzero(ids[changed] == 0))
+        self.dirty = True
+        self.version += 1
+        return True
+
+    def set_block(self, x: int, y: int, z: int, state: int) -> bool:
+        if self._blocks is None and self.block_at(x, y, z) == state:
+            return False # nothing to do, so no need to expand
+
+        return self.set_blocks(np.array([x]), np.array([y]), np.array([z]), np.array([state]))
+
+    def biome_at(self, x: int, y: int, z: int) -> int:
+        return int(self.biomes[y // 4, z // 4, x // 4])
+
+    def compact(self):
+        """Packs an expanded section back into a single value or palette and longs"""
+        if self._blocks is None:
+            return
+        if not self._unpacked: # nothing changed since it was packed, only the cache goes
+            self._blocks = None
+            return
+
+        palette, indices = np.unique(self._blocks, return_inverse=True)
+        if len(palette) == 1:
+            self.value, self.bits, self.data, self.palette = int(palette[0]), 0, None, None
+        else:
+            self.bits = max(4, int(len(palette) - 1).bit_length()) # vanilla never packs blocks under 4 bits
+            self.data = _encode_longs(self.bits, indices.reshape(-1))
+            self.palette = palette.astype(np.uint16)
+        self._blocks = None
+        self._unpacked = False
+
+    @property
+    def nbytes(self) -> int:
+        size = 0
+        for array in (self.data, self.palette, self.biomes, self._blocks):
+            size += 0 if array is None else array.nbytes
+        return size
 
 @dataclass
 class Chunk:
-    """Stores a list of ChunkSections"""
-    #TODO: Read heightmaps from NBT data
-    heightmap: List[int]
+    """
+    Stores a list of ChunkSections and the heightmaps, 16x16 arrays indexed [z][x] of how many
+    blocks above the bottom of the world the top block of every column is (0 for no blocks).
+    """
     sections: List[ChunkSection]
+    heightmaps: Dict[str, np.ndarray] = field(default_factory=dict)
     chunk_height: int = 24
+    x: int = 0 # chunk coordinates, block coordinates divided by 16 rounded down
+    z: int = 0
+    light: ChunkLight | None = None # only read for worlds that want it
 
-    def block_at(self, x: int, y: int, z: int):
-        index = y // 16
-        assert index < len(self.sections) and y % self.chunk_height < len(self.sections[index].blocks)
+    def block_at(self, x: int, y: int, z: int) -> int:
+        """Block at a position relative to the chunk, y counts from the bottom of the world"""
+        index = y // 16 # every section is 16 blocks tall, sections stored by increasing y
+        assert index < len(self.sections), "chunk section does not exist"
         
-        return self.sections[index].blocks[y][z][x]
+        return self.sections[index].block_at(x, y % 16, z)
+
+    def section_blocks(self, index: int) -> np.ndarray:
+        """Expanded blocks of one section, packing the others again if over MAX_CHUNK_BYTES"""
+        section = self.sections[index]
+        if section.expanded:
+            return section.blocks # nothing grew, no need to look at the budget
+
+        blocks = section.blocks
+        if self.nbytes > MAX_CHUNK_BYTES:
+            for other, section in enumerate(self.sections):
+                if other != index:
+                    section.compact()
+
+        return blocks
+
+    def set_blocks(self, index: int, x: np.ndarray, y: np.ndarray, z: np.ndarray, ids: np.ndarray) -> bool:
+        """ChunkSection.set_blocks on one section, expanding it within MAX_CHUNK_BYTES"""
+        self.section_blocks(index)
+        return self.sections[index].set_blocks(x, y, z, ids)
+
+    def compact(self):
+        for section in self.sections:
+            section.compact()
+
+    def height(self, x: int, z: int, heightmap: str = "MOTION_BLOCKING") -> int:
+        """Blocks above the bottom of the world of the top block at x, z in the chunk"""
+        return int(self.heightmaps[heightmap][z, x])
+
+    def column_heights(self, x: np.ndarray, z: np.ndarray, air: np.ndarray = AIR) -> np.ndarray:
+        """
+        Heightmap values of many columns, scanning the sections from the top down with one
+        gather per section until every column found a block that is not air.
+        """
+        heights = np.zeros(len(x), dtype=np.uint16)
+        left = np.ones(len(x), dtype=bool)
+
+        for index in range(len(self.sections) - 1, -1, -1):
+            section = self.sections[index]
+
+            if section.bits == 0 and not section.expanded: # uniform, no need to expand it
+                if section.value in air:
+                    continue
+                heights[left] = index * 16 + 16
+                break
+
+            columns = section.decoded()[:, z[left], x[left]] # (y, column)
+            solid = ~np.isin(columns, air)
+            found = solid.any(axis=0)
+            top = 15 - np.argmax(solid[::-1], axis=0) # highest solid y of every column
+
+            rows = np.flatnonzero(left)[found]
+            heights[rows] = index * 16 + top[found] + 1
+            left[rows] = False
+            if not left.any():
+                break
+
+        return heights
+
+    def derive_heightmaps(self, air: np.ndarray = AIR):
+        """
+        Fills in heightmaps the server did not send from the blocks. Without block properties
+        both treat every block that is not air as solid.
+        """
+        z, x = np.divmod(np.arange(256), 16)
+        heights = self.column_heights(x, z, air).reshape(16, 16)
+
+        for name in HEIGHTMAPS:
+            if name not in self.heightmaps:
+                self.heightmaps[name] = heights.copy()
+
+    def update_heightmaps(self, section: int, x: np.ndarray, y: np.ndarray, z: np.ndarray,
+                          ids: np.ndarray, air: np.ndarray = AIR):
+        """Keeps the heightmaps current after blocks of a section changed"""
+        heights = (section * 16 + np.asarray(y) + 1).astype(np.uint16)
+        solid = ~np.isin(ids, air)
+
+        for heightmap in self.heightmaps.values():
+            np.maximum.at(heightmap, (z[solid], x[solid]), heights[solid])
+
+            # the top block of these columns was removed, so look for the next one down
+            cleared = ~solid & (heightmap[z, x] == heights)
+            if cleared.any():
+                heightmap[z[cleared], x[cleared]] = self.column_heights(x[cleared], z[cleared], air)
+
+    def copy(self) -> "Chunk":
+        """A chunk that can be changed without changing this one, for chunks shared with other players"""
+        return Chunk(sections=[section.copy() for section in self.sections],
+                     heightmaps={name: heights.copy() for name, heights in self.heightmaps.items()},
+                     chunk_height=self.chunk_height, x=self.x, z=self.z,
+                     light=None if self.light is None else self.light.copy())
+
+    def take_dirty(self) -> List[int]:
+        """Indices of the sections changed since the last call, clearing their dirty flags"""
+        dirty = [index for index, section in enumerate(self.sections) if section.dirty]
+        for index in dirty:
+            self.sections[index].dirty = False
+        return dirty
+
+    @property
+    def nbytes(self) -> int:
+        return sum(section.nbytes for section in self.sections) + (self.light.nbytes if self.light else 0)
 
     def destroy_block(self, x: int, y: int, z: int):
         index = y // 16 # every section is 16 blocks tall, sections stored by increasing y
         assert index < len(self.sections), "chunk section does not exist"
 
-def read_chunk(block_registry_func, buff: Buffer) -> Chunk:
+def read_chunk(registry: BlockRegistry | None, buff: Stream, light: bool = False) -> Chunk:
     """
     Every chunk should consume <0.40MB of memory 
     Entire render distance should only take 4MB at most.
-    
+    Without light the block entities and light data after the sections are never looked at.
     """
     chunk_x = buff.read_int()
-    chunk_y = buff.read_int()
+    chunk_z = buff.read_int()
     
     logging.info("reading chunk data")
-    read_nbt(buff) # Heightmaps | NBT | See Chunk Format#Heightmaps structure 
+    heightmaps = _read_heightmaps(buff, 24 * 16) # Heightmaps | NBT | See Chunk Format#Heightmaps structure 
     _ = buff.read_varint() # Data | Prefixed Array of Byte | See Chunk Format#Data structure
     sections = [] 
     
     for _ in range(24): # XXX: 24 chunk sections on vanilla servers. Overworld only!
-        sections.append(_read_chunk_section(block_registry_func, buff))
+        sections.append(_read_chunk_section(registry, buff))
     
-    logging.info(f"chunk coordinates loaded ({chunk_x},{chunk_y})")
+    logging.info(f"chunk coordinates loaded ({chunk_x},{chunk_z})")
     
-    return Chunk(sections=sections, heightmap=[])
+    chunk = Chunk(sections=sections, heightmaps=heightmaps, x=chunk_x, z=chunk_z)
+    if len(heightmaps) < len(HEIGHTMAPS):
+        chunk.derive_heightmaps(air_ids(registry))
+
+    if light:
+        for _ in range(buff.read_varint()): # block entities are not kept
+            buff.skip(3) # packed x z, y
+            buff.read_varint() # type
+            skip_nbt(buff)
+        chunk.light = read_light(buff)
+
+    return chunk
+
+def _read_heightmaps(buff: Stream, height: int) -> Dict[str, np.ndarray]:
+    """Decodes the heightmaps the chunk needs, every entry holds a value from 0 to height"""
+    tags = read_nbt(buff)
+    bits = height.bit_length()
+    heightmaps = {}
+
+    for name in HEIGHTMAPS:
+        longs = tags.get(name) if isinstance(tags, dict) else None
+        if longs is None or len(longs) * (64 // bits) < 256:
+            continue # derived from the blocks instead
 
-def _read_chunk_section(block_registry_func, buff: Buffer) -> ChunkSection:
+        heights = _decode_longs(bits, longs.view(np.uint64), 256)
+        heightmaps[name] = heights.astype(np.uint16).reshape(16, 16)
+
+    return heightmaps
+
+def _read_chunk_section(registry: BlockRegistry | None, buff: Stream) -> ChunkSection:
     # Block count   |   Short   |   Number of non-air blocks present in the chunk section. 
     block_count = buff.read_short() # can be more than 4096
     
-    blocks, block_palette = _read_paletted_container(buff)
-    _, biome_palette = _read_paletted_container(buff)
+    bits, longs, block_palette = _read_paletted_container(buff, MAX_INDIRECT_BLOCK_BITS)
+    biome_bits, biome_longs, biome_palette = _read_paletted_container(buff, MAX_INDIRECT_BIOME_BITS)
+    biomes = _global_ids(biome_bits, biome_longs, biome_palette, BIOMES_PER_SECTION).reshape(4, 4, 4)
     
-    palette_block_names = [block_registry_func(block_id) for block_id in block_palette]
-    if len(block_palette) > 2:
-        logging.debug(blocks)
-    logging.debug(f"blocks={palette_block_names}")
+    if registry is not None and block_palette is not None and logging.root.isEnabledFor(logging.DEBUG):
+        logging.debug(f"blocks={list(registry.names(block_palette))}")
     
-    # TODO: convert to global ids, currently dependent on local indirect palettes
-    return ChunkSection(blocks=blocks)
+    if bits == 0:
+        assert block_palette is not None
+        return ChunkSection(block_count, value=int(block_palette[0]), biomes=biomes)
+
+    return ChunkSection(block_count, bits=bits, data=longs, palette=block_palette, biomes=biomes)
 
-def _read_paletted_container(buff: Buffer) -> Tuple[np.ndarray, List[int]]:
+def _read_paletted_container(buff: Stream, max_indirect_bits: int) -> Tuple[int, np.ndarray, np.ndarray | None]:
+    """
+    Returns the bits per entry, the packed longs and the palette without unpacking them.
+    The palette is None for direct palettes, where the entries already are global ids.
+    """
     # Bits Per Entry    |   Unsigned Byte	|   Determines how many bits are used to encode entries. 
     bits_per_entry = buff.read_ubyte()
-    palette = _read_palette(bits_per_entry, buff)
+    palette = _read_palette(bits_per_entry, max_indirect_bits, buff)
     data_array_length = buff.read_varint() # number of encoded longs for a single chunk section
-    blocks = []
+    # copied to native order so the section does not keep the whole packet alive
+    longs = np.frombuffer(buff.read(data_array_length * 8), dtype=">u8").astype(np.uint64)
 
-    if bits_per_entry != 0:
-        for _ in range(data_array_length):
-            encoded = buff.read_long() # contains multiple entries
-            blocks.extend(_decode_long(bits_per_entry, encoded))
-        
-        #assert len(blocks) == 4096, f"read more than 4096 blocks in read data array"
-    
-    #TODO: Can optimize storage if supporting adding many players at a time
-    return np.resize(np.array(blocks), (16,16,16)), palette
+    return bits_per_entry, longs, palette
 
-def _read_palette(bits_per_entry: int, buff: Buffer) -> List[int]:
-    palette = []
+def _read_palette(bits_per_entry: int, max_indirect_bits: int, buff: Stream) -> np.ndarray | None:
+    if bits_per_entry == 0:
+        # Single valued palette, the data array is empty
+        return np.array([buff.read_varint()], dtype=np.uint16)
+    elif bits_per_entry <= max_indirect_bits:
+        # Palette Length    |   VarInt      |   Number of elements in the following array.
+        palette_length = buff.read_varint()
+        # Palette   |   Array of VarInt     |    Mapping of IDs in the registry to indices of this array.
+        return np.array([buff.read_varint() for _ in range(palette_length)], dtype=np.uint16)
     
-    match bits_per_entry:
-        case 0:
-            block_id = buff.read_varint()
-            palette = [block_id]
-        case 1 | 2 | 3 | 4 | 5 | 6 | 7 | 8:
-            # Palette Length    |   VarInt      |   Number of elements in the following array.
-            palette_length = buff.read_varint()
-            # Palette   |   Array of VarInt     |    Mapping of IDs in the registry to indices of this array.
-            palette = [buff.read_varint() for _ in range(palette_length)]
-        case _:
-            # Direct palettes aren't supported
-            raise ValueError("Invalid palette type or bits per entry."+
-                             f"Cannot use {palette} with {bits_per_entry}")
-    
-    return palette
+    return None # direct palette, no palette is sent
 
-def _decode_long(bits_per_entry: int, number: int) -> List[int]:
-    """Decodes a single encoded long into a list of block ids"""
-    bits_remaining = 64 # size of long
+def _global_ids(bits_per_entry: int, longs: np.ndarray, palette: np.ndarray | None, count: int) -> np.ndarray:
+    """Unpacks count entries and translates them through the palette into uint16 global ids"""
+    if bits_per_entry == 0:
+        assert palette is not None
+        return np.full(count, palette[0], dtype=np.uint16)
 
-    mask = (0b1 << bits_per_entry) - 1
-    block_ids = [] 
-    
-    while bits_remaining >= bits_per_entry:
-        block_ids.append(number & mask) 
-        number >>= bits_per_entry
-        bits_remaining -= bits_per_entry
-    
-    return block_ids
+    indices = _decode_longs(bits_per_entry, longs, count)
+    if len(indices) < count:
+        raise ValueError(f"paletted container holds {len(indices)} entries, expected {count}")
+
+    if palette is None:
+        return indices.astype(np.uint16)
+    return palette.take(indices)
+
+def _decode_longs(bits_per_entry: int, longs: np.ndarray, count: int) -> np.ndarray:
+    """
+    Unpacks every entry of an array of encoded longs at once. Entries never span two longs,
+    so each long holds 64 // bits_per_entry entries starting from its lowest bits.
+    """
+    per_long = 64 // bits_per_entry
+    shifts = np.arange(per_long, dtype=np.uint64) * np.uint64(bits_per_entry)
+    mask = np.uint64((1 << bits_per_entry) - 1)
+
+    entries = (longs[:, None] >> shifts) & mask
+    return entries.reshape(-1)[:count].astype(np.min_scalar_type(int(mask)))
+
+
+def _encode_longs(bits_per_entry: int, entries: np.ndarray) -> np.ndarray:
+    """Inverse of _decode_longs, packs the entries into as many longs as needed"""
+    per_long = 64 // bits_per_entry
+    padded = np.zeros(-(-len(entries) // per_long) * per_long, dtype=np.uint64)
+    padded[:len(entries)] = entries
+    shifts = np.arange(per_long, dtype=np.uint64) * np.uint64(bits_per_entry)
 
+    return np.bitwise_or.reduce(padded.reshape(-1, per_long) << shifts, axis=1)
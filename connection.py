@@ -1,15 +1,33 @@
 """Send and receive data from buffers and socket connections"""
 from abc import ABC, abstractmethod
+import asyncio
 import socket
+import os
 import struct
-from typing import Tuple
-from enum import Enum 
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Deque, List, Tuple
+from uuid import UUID
 import logging
 
-class T(Enum):
-    LONGLONG = "h"
-    UBYTE = "B"
-    BYTE = "b"
+# Precompiled big endian codecs for the fixed size primitives
+BOOL = struct.Struct(">?")
+BYTE = struct.Struct(">b")
+UBYTE = struct.Struct(">B")
+SHORT = struct.Struct(">h")
+USHORT = struct.Struct(">H")
+INT = struct.Struct(">i")
+LONG = struct.Struct(">q")
+ULONG = struct.Struct(">Q")
+FLOAT = struct.Struct(">f")
+DOUBLE = struct.Struct(">d")
+
+@lru_cache(maxsize=None)
+def codec(fmt: str) -> struct.Struct:
+    """Precompiled struct for a format such as "dddff?", big endian unless fmt says otherwise"""
+    return struct.Struct(fmt if fmt[0] in "@=<>!" else ">" + fmt)
 
 class Stream(ABC):
     @abstractmethod
@@ -50,44 +68,107 @@ class Stream(ABC):
             self.write_ubyte(value & 0x7F | 0x80)
             value >>= 7
 
+    def read_varlong(self) -> int:
+        value: int = 0
+        position: int = 0
+
+        while True:
+            current_byte = int(self.read_ubyte())
+            value |= (current_byte & 0x7F) << position
+
+            if current_byte & 0x80 == 0:
+                break
+            position+=7
+
+            if position >= 64: raise RuntimeError("VarLong is too big")
+
+        if value & (1 << (64 - 1)) != 0:
+            value -= 1 << 64
+
+        return value
+
+    def write_varlong(self, value: int):
+        value = value + (1 << 64) if value < 0 else value # convert into twos complement
+
+        while True:
+            if value & ~0x7F == 0:
+                self.write_ubyte(value)
+                return
+
+            self.write_ubyte(value & 0x7F | 0x80)
+            value >>= 7
+
+    def read_position(self) -> Tuple[int, int, int]:
+        """Block position packed into a long as x (26 bits), z (26 bits), y (12 bits)"""
+        val = self.read_long()
+        x = val >> 38
+        y = ((val & 0xFFF) ^ 0x800) - 0x800 # sign extend the low 12 bits
+        z = (((val >> 12) & 0x3FFFFFF) ^ 0x2000000) - 0x2000000
+        return x, y, z
+
+    def write_position(self, position: Tuple[int, int, int]):
+        x, y, z = position
+        self.write(ULONG.pack((x & 0x3FFFFFF) << 38 | (z & 0x3FFFFFF) << 12 | (y & 0xFFF)))
+
+    def read_uuid(self) -> UUID:
+        return UUID(bytes=bytes(self.read(16)))
+
+    def write_uuid(self, uuid: UUID):
+        self.write(uuid.bytes)
+
     def read_byte(self) -> int:
-        return self.read(1)[0]
+        return self.unpack(BYTE)[0]
     
-    def read_int(self, num_bytes: int=4, signed=False) -> int:
-        # XXX: Move these methods into an enum?
-        num = int.from_bytes(self.read(num_bytes), byteorder='big')
-        
-        if num & (1 << (32 - 1)) != 0:
-            num -= 1 << 32 
-        
-        return num
+    def read_int(self, num_bytes: int=4, signed=True) -> int:
+        if num_bytes == 4 and signed:
+            return self.unpack(INT)[0]
+
+        return int.from_bytes(self.read(num_bytes), byteorder='big', signed=signed)
     
     def read_long(self) -> int:
-        return self.read_int(8)
+        return self.unpack(LONG)[0]
     
-    def read_double(self) -> int:
-        return self.read_int(8)
+    def read_double(self) -> float:
+        return self.unpack(DOUBLE)[0]
 
     def read_ubyte(self) -> int:
-        return self.read_int(1, signed=False)
+        return self.unpack(UBYTE)[0]
     
     def read_short(self) -> int:
-        return self.read_int(2)
+        return self.unpack(SHORT)[0]
+
+    def read_ushort(self) -> int:
+        return self.unpack(USHORT)[0]
     
-    def read_float(self) -> int:
-        return self.read_int(4)
+    def read_float(self) -> float:
+        return self.unpack(FLOAT)[0]
      
     def read_longlong(self) -> int:
-        return self.read_int(8)
+        return self.unpack(LONG)[0]
 
     def read_bool(self) -> bool:
-        return bool.from_bytes(self.read(1), byteorder='big')
+        return self.unpack(BOOL)[0]
+
+    def read_many(self, fmt: str) -> tuple:
+        """Reads consecutive fixed size fields in one unpack e.g. read_many("dddff")"""
+        return self.unpack(codec(fmt))
+
+    def write_many(self, fmt: str, *values):
+        self.write(codec(fmt).pack(*values))
+
+    def skip(self, num_bytes: int):
+        """Moves past num_bytes without using them"""
+        self.read(num_bytes)
     
-    def read_utf(self) -> int:
+    def unpack(self, codec: struct.Struct) -> tuple:
+        """Reads codec.size bytes and unpacks them with a precompiled struct"""
+        return codec.unpack(self.read(codec.size))
+
+    def read_utf(self) -> str:
         length = self.read_varint()
         assert length <= 131068, f"Maximum length of utf strings is 131068 bytes but received {length}"
 
-        result = self.read(length).decode("utf-8")
+        result = str(self.read(length), "utf-8")
         assert len(result) <= 32767, (f"Maximum length of utf strings" +
                                       "is 32767 characters but received {result}")
         
@@ -101,28 +182,31 @@ class Stream(ABC):
         self.write(msg.encode("utf-8"))
 
     def write_ushort(self, msg: int):
-        self.write(struct.pack(">H", msg))
+        self.write(USHORT.pack(msg))
     
     def write_longlong(self, msg: int):
-        self.write(struct.pack(">q", msg))
+        self.write(LONG.pack(msg))
     
-    def write_float(self, msg: int):
-        self.write(struct.pack(">f", msg))
+    def write_float(self, msg: float):
+        self.write(FLOAT.pack(msg))
+
+    def write_double(self, msg: float):
+        self.write(DOUBLE.pack(msg))
     
     def write_byte(self, msg: int):
-        self.write(struct.pack(">b", msg))
+        self.write(BYTE.pack(msg))
     
     def write_ubyte(self, msg: int):
-        self.write(struct.pack(">B", msg))
+        self.write(UBYTE.pack(msg))
 
     def write_short(self, msg: int):
-        self.write(struct.pack(">h", msg))
+        self.write(SHORT.pack(msg))
     
     def write_int(self, msg: int):
-        self.write(struct.pack(">i", msg))
+        self.write(INT.pack(msg))
 
-    def write_bool(self, msg: int):
-        self.write(struct.pack(">?", msg))
+    def write_bool(self, msg: bool):
+        self.write(BOOL.pack(msg))
 
 class Buffer(Stream, bytearray):
     def __init__(self, data: bytearray = bytearray()):
@@ -147,55 +231,393 @@ class Buffer(Stream, bytearray):
     def flush(self):
         return self.read(len(self) - self.pos)
 
-class Connection(Stream):
-    def __init__(self, client: socket.socket):
-        self.client = client 
-    
-    def __enter__(self):
-        return self
+class BufferView(Stream):
+    """
+    Read only Buffer over a memoryview of a received packet. Reads return views into the
+    packet and primitives are unpacked in place, so decoding never copies the payload.
+    """
+    def __init__(self, data: bytes | bytearray | memoryview, pos: int = 0):
+        self.view = memoryview(data)
+        self.pos = pos
 
-    def __exit__(self, exc_type, exc_value, traceback):
-        self.client.shutdown(socket.SHUT_RDWR)
-        self.client.close()
+    def __len__(self):
+        return len(self.view)
 
-    def read(self, num_bytes: int)->bytearray:
-        result = bytearray() 
-        
-        while len(result) < num_bytes:
-            msg = self.client.recv(num_bytes - len(result))
-            if len(msg) == 0: 
-                raise IOError("Connection must be closed")
-            
-            result.extend(msg)
+    def read(self, num_bytes: int) -> memoryview:
+        start = self.pos
+        end = start + num_bytes
+        if end > len(self.view):
+            raise ValueError(f"Cannot read past end of buffer {end}/{len(self.view)}")
+        self.pos = end
+
+        return self.view[start:end]
 
-        return result 
-    
     def write(self, msg: bytearray | bytes):
-        sent = 0
+        raise TypeError("BufferView is read only, use a Buffer to build packets")
+
+    def unpack(self, codec: struct.Struct) -> tuple:
+        if self.pos + codec.size > len(self.view):
+            raise ValueError(f"Cannot read past end of buffer {self.pos+codec.size}/{len(self.view)}")
+        values = codec.unpack_from(self.view, self.pos)
+        self.pos += codec.size
+        return values
+
+    def read_ubyte(self) -> int:
+        if self.pos >= len(self.view):
+            raise ValueError(f"Cannot read past end of buffer {self.pos+1}/{len(self.view)}")
+        self.pos += 1
+        return self.view[self.pos - 1]
+
+    def read_bool(self) -> bool:
+        return self.read_ubyte() != 0
+
+    def read_varint(self) -> int:
+        view, pos = self.view, self.pos
+        value: int = 0
+        position: int = 0
+
+        while True:
+            if pos >= len(view):
+                raise ValueError(f"Cannot read past end of buffer {pos+1}/{len(view)}")
+            current_byte = view[pos]
+            pos += 1
+            value |= (current_byte & 0x7F) << position
+
+            if current_byte & 0x80 == 0:
+                break
+            position+=7
+
+            if position >= 32: raise RuntimeError("VarInt is too big")
+
+        self.pos = pos
+
+        if value & (1 << (32 - 1)) != 0:
+            value -= 1 << 32
+
+        return value
+
+    def skip(self, num_bytes: int):
+        end = self.pos + num_bytes
+        if end > len(self.view):
+            raise ValueError(f"Cannot read past end of buffer {end}/{len(self.view)}")
+        self.pos = end
+
+    @property
+    def remaining(self):
+        return len(self.view) - self.pos
+
+    def flush(self):
+        return self.read(len(self.view) - self.pos)
+
+RECV_BUFFER_SIZE = 1 << 16 # bytes received per recv_into call at most
+MAX_PENDING_FRAMES = 1024 # stop reading from the socket when this many packets are unread
+MAX_FRAME_SIZE = 2097151 # largest length a 3 byte VarInt prefix can hold
+FLUSH_THRESHOLD = 1 << 16 # queued bytes that are flushed without waiting for the next tick
+INFLATE_OFFLOAD_SIZE = 1 << 13 # packets at least this big are decompressed on a worker thread
+INFLATE_WORKERS = min(4, os.cpu_count() or 1)
+PEEK_SIZE = 16 # bytes of a packet a frame filter gets to see, enough for the id and a chunk position
+
+_inflate_executor: ThreadPoolExecutor | None = None
+
+def inflate_executor() -> ThreadPoolExecutor:
+    """Thread pool shared by every connection. zlib releases the GIL while it inflates"""
+    global _inflate_executor
+
+    if _inflate_executor is None:
+        _inflate_executor = ThreadPoolExecutor(INFLATE_WORKERS, thread_name_prefix="inflate")
+
+    return _inflate_executor
+
+class PacketProtocol(asyncio.BufferedProtocol):
+    """
+    Receives into a preallocated buffer and slices every complete length prefixed frame
+    out of it, so reading a packet never costs more than the recv_into that delivered it.
+    Partial frames are moved to the front of the buffer, which only grows for frames
+    larger than itself.
+    """
+    def __init__(self):
+        self.transport: asyncio.Transport | None = None
+        self.frames: Deque[bytes] = deque()
+        self._buffer = bytearray(RECV_BUFFER_SIZE)
+        self._start = 0 # first byte of the next unparsed frame
+        self._end = 0 # end of the received data
+        self._needed = 0 # size of the incomplete frame at _start if its prefix was read
+        self._exception: Exception | None = None
+        self._read_waiter: asyncio.Future | None = None
+        self._drain_waiter: asyncio.Future | None = None
+        self._reading_paused = False
+        self._writing_paused = False
+        self.frame_filter: Callable[[memoryview], bool] | None = None # rejected frames are never copied
+        self.dropped = 0
+
+    def connection_made(self, transport: asyncio.BaseTransport):
+        assert isinstance(transport, asyncio.Transport)
+        self.transport = transport
+
+    def connection_lost(self, exc: Exception | None):
+        self._exception = exc or IOError("Connection must be closed")
+        self._wake(self._read_waiter)
+        self._wake(self._drain_waiter)
+
+    def eof_received(self):
+        return False # let the transport close itself
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        pending = self._end - self._start
+
+        if pending == 0:
+            self._start = self._end = 0
+        elif len(self._buffer) - self._end < RECV_BUFFER_SIZE // 4 or self._needed > len(self._buffer) - self._start:
+            self._buffer[:pending] = self._buffer[self._start:self._end]
+            self._start, self._end = 0, pending
+
+            if self._needed > len(self._buffer):
+                self._buffer.extend(bytes(self._needed - len(self._buffer)))
+
+        return memoryview(self._buffer)[self._end:]
+
+    def buffer_updated(self, nbytes: int):
+        self._end += nbytes
+        buffer, pos, end = self._buffer, self._start, self._end
+
+        with memoryview(buffer) as view:
+            while pos < end:
+                length, shift, body = 0, 0, pos
+
+                while body < end:
+                    current_byte = buffer[body]
+                    body += 1
+                    length |= (current_byte & 0x7F) << shift
+
+                    if current_byte & 0x80 == 0:
+                        break
+                    shift += 7
+                else:
+                    break # the length prefix itself is incomplete
+
+                if length > MAX_FRAME_SIZE:
+                    raise RuntimeError(f"Packet is too big {length}/{MAX_FRAME_SIZE}")
+
+                if body + length > end:
+                    self._needed = body + length - pos
+                    break
+
+                frame = view[body:body + length]
+                if self.frame_filter is None or self.frame_filter(frame):
+                    self.frames.append(bytes(frame))
+                else:
+                    self.dropped += 1
+                pos = body + length
+                self._needed = 0
+
+        self._start = pos
+
+        if len(self.frames) >= MAX_PENDING_FRAMES and not self._reading_paused:
+            assert self.transport is not None
+            self.transport.pause_reading()
+            self._reading_paused = True
+
+        self._wake(self._read_waiter)
+
+    def pause_writing(self):
+        self._writing_paused = True
+
+    def resume_writing(self):
+        self._writing_paused = False
+        self._wake(self._drain_waiter)
+
+    async def read_frame(self) -> bytes:
+        while not self.frames:
+            if self._exception is not None:
+                raise self._exception
+
+            self._read_waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._read_waiter
+            finally:
+                self._read_waiter = None
+
+        if self._reading_paused and len(self.frames) <= MAX_PENDING_FRAMES // 2:
+            assert self.transport is not None
+            self._reading_paused = False
+            self.transport.resume_reading()
+
+        return self.frames.popleft()
+
+    async def drain(self):
+        if self._exception is not None:
+            raise self._exception
+
+        while self._writing_paused:
+            self._drain_waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._drain_waiter
+            finally:
+                self._drain_waiter = None
+
+            if self._exception is not None:
+                raise self._exception
+
+    @staticmethod
+    def _wake(waiter: asyncio.Future | None):
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+class Connection:
+    """
+    Packet stream over an asyncio transport. Writes are buffered by the transport and
+    reads suspend the calling task instead of blocking the event loop, so any number of
+    players can share a single loop. Packets are read whole with read_frame.
+    """
+    def __init__(self, transport: asyncio.Transport, protocol: PacketProtocol):
+        self.transport = transport
+        self.protocol = protocol
+        self.batching = False # when set, queued packets wait for flush() once per tick
+        self.compression_threshold = -1 # packets this size or larger are compressed, -1 disables
+        self._queue: List[bytes | bytearray] = []
+        self._queued = 0 # bytes waiting in _queue
+        self._keep: Callable[[int, memoryview], bool] | None = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        self.flush()
+        self.transport.close()
+
+    def set_compression(self, threshold: int):
+        """Switches both directions to the compressed packet format (login Set Compression)"""
+        self.compression_threshold = threshold
+
+    def set_filter(self, keep: Callable[[int, memoryview], bool] | None):
+        """
+        Drops unwanted packets as they are received, before they are copied out of the receive
+        buffer. keep is called with the packet id and the first bytes of the body (PEEK_SIZE at
+        most), compressed packets only have those bytes inflated. None removes the filter.
+        """
+        self._keep = keep
+        self.protocol.frame_filter = None if keep is None else self._filter
+
+    def _filter(self, frame: memoryview) -> bool:
+        packet = frame
+        if self.compression_threshold >= 0:
+            header = BufferView(frame)
+            data_length = header.read_varint()
+            packet = header.flush()
+
+            if data_length != 0:
+                packet = memoryview(zlib.decompressobj().decompress(packet, PEEK_SIZE))
+
+        if len(packet) == 0:
+            return True
+
+        assert self._keep is not None
+        p_id, offset = packet_id(packet)
+        return self._keep(p_id, packet[offset:offset + PEEK_SIZE])
+
+    async def read_frame(self) -> bytes | memoryview:
+        """Waits for the next packet without its length prefix, decompressing it if needed"""
+        frame = await self.protocol.read_frame()
+
+        if self.compression_threshold < 0:
+            return frame
+
+        header = BufferView(frame)
+        data_length = header.read_varint()
+        compressed = header.flush()
+
+        if data_length == 0: # sent uncompressed because it was below the threshold
+            return compressed
+
+        if data_length >= INFLATE_OFFLOAD_SIZE:
+            loop = asyncio.get_running_loop()
+            packet = await loop.run_in_executor(inflate_executor(), zlib.decompress, compressed)
+        else:
+            packet = zlib.decompress(compressed)
+
+        if len(packet) != data_length:
+            raise RuntimeError(f"Decompressed packet is {len(packet)} bytes, expected {data_length}")
+
+        return packet
+
+    def queue(self, packet: bytearray | bytes):
+        """Frames a packet with its length prefix and holds it until the next flush"""
+        header = bytearray()
+
+        if self.compression_threshold >= 0:
+            if len(packet) >= self.compression_threshold:
+                _append_varint(header, len(packet)) # uncompressed data length
+                packet = zlib.compress(packet)
+            else:
+                header.append(0) # data length of 0 marks an uncompressed packet
+
+        prefix = bytearray()
+        _append_varint(prefix, len(header) + len(packet))
+        prefix += header
+
+        self._queue.append(prefix)
+        self._queue.append(packet)
+        self._queued += len(prefix) + len(packet)
+
+        if self._queued >= FLUSH_THRESHOLD:
+            self.flush()
+
+    def flush(self):
+        """Hands every queued packet to the transport at once so they leave in a single send"""
+        if not self._queue or self.transport.is_closing():
+            return
+
+        queue, self._queue, self._queued = self._queue, [], 0
+        self.transport.writelines(queue)
+
+    async def drain(self):
+        """Waits until the transport's write buffer is below its high water mark"""
+        await self.protocol.drain()
 
-        while sent < len(msg):
-            sent += self.client.send(msg[sent:])
-    
     @classmethod
-    def create(cls, ip: str, port: int):
+    async def create(cls, ip: str, port: int, timeout: float = 5):
         """
             :raises OSError: If socket fails to be created
+            :raises TimeoutError: If the server does not accept within timeout seconds
         """
-        client = socket.create_connection((ip, port), timeout=5)
+        loop = asyncio.get_running_loop()
+        transport, protocol = await asyncio.wait_for(
+            loop.create_connection(PacketProtocol, ip, port), timeout)
+        client: socket.socket = transport.get_extra_info("socket")
         client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
-        return cls(client)
+        return cls(transport, protocol)
+
+def _append_varint(out: bytearray, value: int):
+    while value & ~0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
 
 async def send(conn: Connection, packet: Buffer):
-    """Prefixes a packet with the length then sends to the server"""
-    conn.write_varint(len(packet))
-    conn.write(bytes(packet))
-
-async def read(conn: Connection) -> Tuple[int, Buffer]:
-    """Reads an incoming packet from the connection and stores in a buffer"""
-    response_len = conn.read_varint()
-    response = conn.read(response_len)
-    buff = Buffer(response)
-    p_id = buff.read_varint() # packet id
-    return p_id, buff
+    """
+    Prefixes a packet with the length then queues it for the server. The packet is sent
+    straight away unless the connection is batching, where it waits for the next flush.
+    The packet must not be modified after it is sent.
+    """
+    conn.queue(packet)
+    if not conn.batching:
+        conn.flush()
+    await conn.drain()
+
+def packet_id(frame: bytes | memoryview) -> Tuple[int, int]:
+    """Reads the packet id at the start of a frame. Returns the id and the offset of the body"""
+    if frame[0] < 0x80:
+        return frame[0], 1
 
+    buff = BufferView(frame)
+    p_id = buff.read_varint()
+    return p_id, buff.pos
 
+async def read(conn: Connection) -> Tuple[int, BufferView]:
+    """Reads an incoming packet from the connection and wraps it in a buffer without copying"""
+    buff = BufferView(await conn.read_frame())
+    p_id = buff.read_varint() # packet id
+    return p_id, buff
@@ -1,6 +1,7 @@
 """Generate all packets, blocks, and other asset data extracted from Minecraft"""
 import logging
 import json
+from typing import List
 
 def generate():
     packets = None
@@ -12,8 +13,9 @@ def generate():
     pool = packets["play"]["clientbound"]
     
     with open("./packets.py", "w") as file:
-        file.write("\"\"\"Generated by generate.py\"\"\"")
+        file.write("\"\"\"Generated by generate.py\"\"\"\n")
         file.write("from dataclasses import dataclass\n")
+        file.write("from typing import Dict\n")
         file.write("\n")
         file.write("@dataclass(frozen=True)\n")
         file.write("class Clientbound:\n")
@@ -26,20 +28,183 @@ def generate():
         file.write("\n")
         file.write("    @classmethod\n")
         file.write("    def for_id(cls, p_id: int) -> str:\n")
-        file.write("        for attr, value in cls.__dict__.items():\n")
-        file.write("            if not attr.startswith('__'):  # Ignore special attributes like __module__\n")
-        file.write("                if value == p_id:\n")
-        file.write("                    return attr\n")
-        file.write("        return \"\"\n\n")
+        file.write("        return CLIENTBOUND_NAMES.get(p_id, \"\")\n\n")
+
+        # reverse table so looking up a packet name never scans the class
+        file.write("CLIENTBOUND_NAMES: Dict[int, str] = {\n")
+        for packet in sorted(pool, key=lambda packet: pool[packet]["protocol_id"]):
+            file.write(f"    {hex(pool[packet]['protocol_id'])}: \"{packet.split(':')[1]}\",\n")
+        file.write("}\n")
         file.flush()
         file.close()
 
+# struct format of every fixed size field type, consecutive ones are read in one unpack
+FIXED_FORMATS = {
+    "bool": "?", "byte": "b", "ubyte": "B", "angle": "B", "short": "h",
+    "ushort": "H", "int": "i", "long": "q", "float": "f", "double": "d",
+}
+
+# Stream method suffix and python type of every variable size field type
+VARIABLE_TYPES = {
+    "varint": ("varint", "int"),
+    "varlong": ("varlong", "int"),
+    "string": ("utf", "str"),
+    "uuid": ("uuid", "UUID"),
+    "position": ("position", "Tuple[int, int, int]"),
+}
+
+PYTHON_TYPES = {"bool": "bool", "float": "float", "double": "float"}
+
+def _class_name(packet: str) -> str:
+    return "".join(part.capitalize() for part in packet.split("_"))
+
+def _constant_name(name: str, index: int) -> str:
+    """Module level name of the struct for a run of fixed fields in a generated class"""
+    snake = "".join(f"_{char}" if char.isupper() else char for char in name).upper()
+    return f"{snake}_{index}"
+
+def _group_fields(fields):
+    """Splits fields into runs of fixed size fields and single variable size fields"""
+    groups = []
+
+    for name, kind in fields:
+        if kind in FIXED_FORMATS and groups and groups[-1][0] == "fixed":
+            groups[-1][1].append((name, kind))
+        elif kind in FIXED_FORMATS:
+            groups.append(("fixed", [(name, kind)]))
+        else:
+            groups.append((kind, [(name, kind)]))
+
+    return groups
+
+def _python_type(kind: str) -> str:
+    if kind.endswith("[]"):
+        return f"List[{_python_type(kind[:-2])}]"
+    if kind == "rest":
+        return "bytes"
+    if kind in VARIABLE_TYPES:
+        return VARIABLE_TYPES[kind][1]
+
+    return PYTHON_TYPES.get(kind, "int")
+
+def _read_expression(kind: str) -> str:
+    if kind.endswith("[]"):
+        return f"[{_read_expression(kind[:-2])} for _ in range(buff.read_varint())]"
+    if kind == "rest":
+        return "buff.flush()"
+
+    return f"buff.read_{VARIABLE_TYPES[kind][0]}()"
+
+def _write_lines(kind: str, value: str) -> List[str]:
+    if kind.endswith("[]"):
+        return [f"buff.write_varint(len({value}))",
+                f"for item in {value}:",
+                f"    {_write_lines(kind[:-2], 'item')[0]}"]
+    if kind == "rest":
+        return [f"buff.write({value})"]
+
+    return [f"buff.write_{VARIABLE_TYPES[kind][0]}({value})"]
+
+def _write_message(file, state: str, direction: str, packet: str, schema: dict):
+    name = schema.get("class", _class_name(packet))
+    fields = [tuple(field) for field in schema["fields"]]
+    groups = _group_fields(fields)
+    names = [field for field, _ in fields]
+
+    for index, (kind, group) in enumerate(groups):
+        if kind == "fixed":
+            fmt = "".join(FIXED_FORMATS[field_kind] for _, field_kind in group)
+            file.write(f"{_constant_name(name, index)} = struct.Struct(\">{fmt}\")\n")
+
+    file.write(f"\nclass {name}:\n")
+    file.write(f"    \"\"\"minecraft:{packet} ({state} {direction} {schema['id']})\"\"\"\n")
+    slots = ", ".join(f"\"{field}\"" for field in names) + ("," if len(names) == 1 else "")
+    file.write(f"    __slots__ = ({slots})\n")
+    file.write(f"    packet_id = {schema['id']}\n\n")
+
+    arguments = "".join(f", {field}: {_python_type(kind)}" for field, kind in fields)
+    file.write(f"    def __init__(self{arguments}):\n")
+    for field in names:
+        file.write(f"        self.{field} = {field}\n")
+    if not names:
+        file.write("        pass\n")
+
+    file.write("\n    @classmethod\n")
+    file.write(f"    def read(cls, buff: Stream) -> \"{name}\":\n")
+    for index, (kind, group) in enumerate(groups):
+        targets = ", ".join(field for field, _ in group)
+        if kind == "fixed":
+            file.write(f"        {targets}, = buff.unpack({_constant_name(name, index)})\n")
+        else:
+            file.write(f"        {targets} = {_read_expression(kind)}\n")
+    file.write(f"        return cls({', '.join(names)})\n\n")
+
+    file.write("    def write(self, buff: Stream):\n")
+    for index, (kind, group) in enumerate(groups):
+        if kind == "fixed":
+            values = ", ".join(f"self.{field}" for field, _ in group)
+            file.write(f"        buff.write({_constant_name(name, index)}.pack({values}))\n")
+        else:
+            for line in _write_lines(kind, f"self.{group[0][0]}"):
+                file.write(f"        {line}\n")
+    if not groups:
+        file.write("        pass\n")
+
+    file.write("\n    def to_buffer(self) -> Buffer:\n")
+    file.write("        \"\"\"The packet id followed by the fields, ready to send\"\"\"\n")
+    file.write("        buff = Buffer()\n")
+    file.write("        buff.write_varint(self.packet_id)\n")
+    file.write("        self.write(buff)\n")
+    file.write("        return buff\n\n")
+
+    fields_repr = ", ".join(f"{field}={{self.{field}!r}}" for field in names)
+    file.write("    def __repr__(self):\n")
+    file.write(f"        return f\"{name}({fields_repr})\"\n\n")
+
+    return name
+
+def generate_messages(schema_path: str = "./messages.json", output: str = "./messages.py"):
+    """
+    Generates a __slots__ class per packet described in the schema with straight line
+    read and write methods. Runs of fixed size fields share one precompiled struct.
+    """
+    with open(schema_path, "r") as file:
+        schema = json.load(file)
+
+    with open(output, "w") as file:
+        file.write(f"\"\"\"Generated by generate.py from {schema_path.split('/')[-1]}\"\"\"\n")
+        file.write("import struct\n")
+        file.write("from typing import Dict, List, Tuple\n")
+        file.write("from uuid import UUID\n\n")
+        file.write("from connection import Buffer, Stream\n\n")
+
+        registries = {}
+        classes = set()
+
+        for state, directions in schema.items():
+            for direction, packets in directions.items():
+                registry = registries.setdefault(f"{state}_{direction}".upper(), {})
+
+                for packet, packet_schema in packets.items():
+                    name = _write_message(file, state, direction, packet, packet_schema)
+                    assert name not in classes, f"{state} {direction} {packet} reuses class name {name}"
+                    classes.add(name)
+                    registry[packet_schema["id"]] = name
+
+        for registry, packets in registries.items():
+            file.write(f"{registry}: Dict[int, type] = {{\n")
+            for p_id, name in sorted(packets.items(), key=lambda item: int(item[0], 16)):
+                file.write(f"    {p_id}: {name},\n")
+            file.write("}\n\n")
+
 if __name__ == "__main__":
     import subprocess
     import argparse
 
     parser = argparse.ArgumentParser(description="Generate the packets.py file from generated server reports")
     parser.add_argument("-r", "--reports", help="Generate the reports from the server jar", action='store_true')
+    parser.add_argument("-m", "--messages", help="Only generate messages.py from messages.json",
+                        action='store_true')
 
     # Parse arguments
     args = parser.parse_args()
@@ -50,5 +215,6 @@ if __name__ == "__main__":
                           "../server/server.jar --reports"
                           ), shell=True)
 
-    generate()
-
+    if not args.messages:
+        generate()
+    generate_messages()
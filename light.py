@@ -0,0 +1,110 @@
+"""
+Sky and block light sent with level_chunk_with_light and light_update.
+Light is most of a chunk packet but few bots look at it, so reading it only records where every
+section is and nibbles are unpacked when a section is asked for.
+"""
+from typing import Iterator, List
+
+import numpy as np
+
+from connection import BufferView, Stream, ULONG
+
+LIGHT_SECTIONS = 26 # every block section plus one below and one above the world
+LIGHT_BYTES = 2048 # 4096 nibbles
+
+Light = int | memoryview | bytes | None
+
+class ChunkLight:
+    """
+    Light of the 26 light sections of a chunk, index 0 being the section below the world.
+    Every section is None when it was never sent, 0 when the server sent it as empty, or its
+    2048 bytes as a view into the copy of the packet it came from.
+    """
+    __slots__ = ("sky", "block")
+
+    def __init__(self):
+        self.sky: List[Light] = [None] * LIGHT_SECTIONS
+        self.block: List[Light] = [None] * LIGHT_SECTIONS
+
+    def __getstate__(self):
+        # views cannot be pickled, chunks decoded on a worker hand their light over as bytes
+        return [_owned(section) for section in self.sky], [_owned(section) for section in self.block]
+
+    def __setstate__(self, state):
+        self.sky, self.block = state
+
+    def copy(self) -> "ChunkLight":
+        """The sections themselves are never written to, so only the lists are copied"""
+        copy = ChunkLight()
+        copy.sky, copy.block = list(self.sky), list(self.block)
+        return copy
+
+    def sky_light(self, index: int) -> np.ndarray | None:
+        """Sky light of a light section as a 16x16x16 array indexed [y][z][x], None if never sent"""
+        return _unpack(self.sky[index])
+
+    def block_light(self, index: int) -> np.ndarray | None:
+        return _unpack(self.block[index])
+
+    def light_at(self, x: int, y: int, z: int, sky: bool = True) -> int | None:
+        """Light level at a position relative to the chunk, y counts from the bottom of the light sections"""
+        section = (self.sky if sky else self.block)[y >> 4]
+        if section is None or isinstance(section, int):
+            return section
+
+        index = ((y & 15) << 8) | (z << 4) | x
+        return (section[index >> 1] >> ((index & 1) << 2)) & 15 # even blocks are in the low nibble
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(section) for section in self.sky + self.block if isinstance(section, (memoryview, bytes)))
+
+def read_light(buff: Stream, light: ChunkLight | None = None) -> ChunkLight:
+    """
+    Reads the light data that ends level_chunk_with_light and light_update into light, or into a
+    new ChunkLight. The rest of the packet is copied once and every section sent is kept as a view
+    into that copy. Sections the masks do not mention keep the light they had.
+    """
+    light = light or ChunkLight()
+    buff = BufferView(bytes(buff.flush())) # copied so the light does not keep the packet alive
+    masks = [_read_bitset(buff) for _ in range(4)] # sky, block, empty sky, empty block
+
+    for sections, mask, empty_mask in ((light.sky, masks[0], masks[2]), (light.block, masks[1], masks[3])):
+        for index in _bits(empty_mask):
+            sections[index] = 0
+
+        indices = _bits(mask)
+        for _ in range(buff.read_varint()):
+            index = next(indices, None)
+            data = buff.read(buff.read_varint())
+            if index is not None and len(data) == LIGHT_BYTES:
+                sections[index] = data
+
+    return light
+
+def _read_bitset(buff: Stream) -> int:
+    mask = 0
+    for index in range(buff.read_varint()):
+        mask |= buff.unpack(ULONG)[0] << (64 * index)
+    return mask
+
+def _bits(mask: int) -> Iterator[int]:
+    """Indices of the set bits of a mask from the lowest, limited to the light sections"""
+    for index in range(min(mask.bit_length(), LIGHT_SECTIONS)):
+        if mask >> index & 1:
+            yield index
+
+def _owned(section: Light) -> Light:
+    return bytes(section) if isinstance(section, memoryview) else section
+
+def _unpack(section: Light) -> np.ndarray | None:
+    if section is None:
+        return None
+    if isinstance(section, int):
+        return np.full((16, 16, 16), section, dtype=np.uint8)
+
+    packed = np.frombuffer(section, dtype=np.uint8)
+    nibbles = np.empty(4096, dtype=np.uint8)
+    nibbles[0::2] = packed & 15
+    nibbles[1::2] = packed >> 4
+    return nibbles.reshape(16, 16, 16)
@@ -0,0 +1,1295 @@
+"""Generated by generate.py from messages.json"""
+import struct
+from typing import Dict, List, Tuple
+from uuid import UUID
+
+from connection import Buffer, Stream
+
+_INTENTION_2 = struct.Struct(">H")
+
+class Intention:
+    """minecraft:intention (handshake serverbound 0x00)"""
+    __slots__ = ("protocol_version", "host", "port", "next_state")
+    packet_id = 0x00
+
+    def __init__(self, protocol_version: int, host: str, port: int, next_state: int):
+        self.protocol_version = protocol_version
+        self.host = host
+        self.port = port
+        self.next_state = next_state
+
+    @classmethod
+    def read(cls, buff: Stream) -> "Intention":
+        protocol_version = buff.read_varint()
+        host = buff.read_utf()
+        port, = buff.unpack(_INTENTION_2)
+        next_state = buff.read_varint()
+        return cls(protocol_version, host, port, next_state)
+
+    def write(self, buff: Stream):
+        buff.write_varint(self.protocol_version)
+        buff.write_utf(self.host)
+        buff.write(_INTENTION_2.pack(self.port))
+        buff.write_varint(self.next_state)
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"Intention(protocol_version={self.protocol_version!r}, host={self.host!r}, port={self.port!r}, next_state={self.next_state!r})"
+
+
+class LoginDisconnect:
+    """minecraft:login_disconnect (login clientbound 0x00)"""
+    __slots__ = ("reason",)
+    packet_id = 0x00
+
+    def __init__(self, reason: str):
+        self.reason = reason
+
+    @classmethod
+    def read(cls, buff: Stream) -> "LoginDisconnect":
+        reason = buff.read_utf()
+        return cls(reason)
+
+    def write(self, buff: Stream):
+        buff.write_utf(self.reason)
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"LoginDisconnect(reason={self.reason!r})"
+
+
+class EncryptionRequest:
+    """minecraft:hello (login clientbound 0x01)"""
+    __slots__ = ("payload",)
+    packet_id = 0x01
+
+    def __init__(self, payload: bytes):
+        self.payload = payload
+
+    @classmethod
+    def read(cls, buff: Stream) -> "EncryptionRequest":
+        payload = buff.flush()
+        return cls(payload)
+
+    def write(self, buff: Stream):
+        buff.write(self.payload)
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"EncryptionRequest(payload={self.payload!r})"
+
+
+class LoginFinished:
+    """minecraft:login_finished (login clientbound 0x02)"""
+    __slots__ = ("uuid", "name", "properties")
+    packet_id = 0x02
+
+    def __init__(self, uuid: UUID, name: str, properties: bytes):
+        self.uuid = uuid
+        self.name = name
+        self.properties = properties
+
+    @classmethod
+    def read(cls, buff: Stream) -> "LoginFinished":
+        uuid = buff.read_uuid()
+        name = buff.read_utf()
+        properties = buff.flush()
+        return cls(uuid, name, properties)
+
+    def write(self, buff: Stream):
+        buff.write_uuid(self.uuid)
+        buff.write_utf(self.name)
+        buff.write(self.properties)
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"LoginFinished(uuid={self.uuid!r}, name={self.name!r}, properties={self.properties!r})"
+
+
+class LoginCompression:
+    """minecraft:login_compression (login clientbound 0x03)"""
+    __slots__ = ("threshold",)
+    packet_id = 0x03
+
+    def __init__(self, threshold: int):
+        self.threshold = threshold
+
+    @classmethod
+    def read(cls, buff: Stream) -> "LoginCompression":
+        threshold = buff.read_varint()
+        return cls(threshold)
+
+    def write(self, buff: Stream):
+        buff.write_varint(self.threshold)
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"LoginCompression(threshold={self.threshold!r})"
+
+
+class CustomQuery:
+    """minecraft:custom_query (login clientbound 0x04)"""
+    __slots__ = ("message_id", "channel", "data")
+    packet_id = 0x04
+
+    def __init__(self, message_id: int, channel: str, data: bytes):
+        self.message_id = message_id
+        self.channel = channel
+        self.data = data
+
+    @classmethod
+    def read(cls, buff: Stream) -> "CustomQuery":
+        message_id = buff.read_varint()
+        channel = buff.read_utf()
+        data = buff.flush()
+        return cls(message_id, channel, data)
+
+    def write(self, buff: Stream):
+        buff.write_varint(self.message_id)
+        buff.write_utf(self.channel)
+        buff.write(self.data)
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"CustomQuery(message_id={self.message_id!r}, channel={self.channel!r}, data={self.data!r})"
+
+
+class Hello:
+    """minecraft:hello (login serverbound 0x00)"""
+    __slots__ = ("name", "uuid")
+    packet_id = 0x00
+
+    def __init__(self, name: str, uuid: UUID):
+        self.name = name
+        self.uuid = uuid
+
+    @classmethod
+    def read(cls, buff: Stream) -> "Hello":
+        name = buff.read_utf()
+        uuid = buff.read_uuid()
+        return cls(name, uuid)
+
+    def write(self, buff: Stream):
+        buff.write_utf(self.name)
+        buff.write_uuid(self.uuid)
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"Hello(name={self.name!r}, uuid={self.uuid!r})"
+
+_CUSTOM_QUERY_ANSWER_1 = struct.Struct(">?")
+
+class CustomQueryAnswer:
+    """minecraft:custom_query_answer (login serverbound 0x02)"""
+    __slots__ = ("message_id", "has_payload")
+    packet_id = 0x02
+
+    def __init__(self, message_id: int, has_payload: bool):
+        self.message_id = message_id
+        self.has_payload = has_payload
+
+    @classmethod
+    def read(cls, buff: Stream) -> "CustomQueryAnswer":
+        message_id = buff.read_varint()
+        has_payload, = buff.unpack(_CUSTOM_QUERY_ANSWER_1)
+        return cls(message_id, has_payload)
+
+    def write(self, buff: Stream):
+        buff.write_varint(self.message_id)
+        buff.write(_CUSTOM_QUERY_ANSWER_1.pack(self.has_payload))
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"CustomQueryAnswer(message_id={self.message_id!r}, has_payload={self.has_payload!r})"
+
+
+class LoginAcknowledged:
+    """minecraft:login_acknowledged (login serverbound 0x03)"""
+    __slots__ = ()
+    packet_id = 0x03
+
+    def __init__(self):
+        pass
+
+    @classmethod
+    def read(cls, buff: Stream) -> "LoginAcknowledged":
+        return cls()
+
+    def write(self, buff: Stream):
+        pass
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"LoginAcknowledged()"
+
+
+class CustomPayload:
+    """minecraft:custom_payload (configuration clientbound 0x01)"""
+    __slots__ = ("channel", "data")
+    packet_id = 0x01
+
+    def __init__(self, channel: str, data: bytes):
+        self.channel = channel
+        self.data = data
+
+    @classmethod
+    def read(cls, buff: Stream) -> "CustomPayload":
+        channel = buff.read_utf()
+        data = buff.flush()
+        return cls(channel, data)
+
+    def write(self, buff: Stream):
+        buff.write_utf(self.channel)
+        buff.write(self.data)
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"CustomPayload(channel={self.channel!r}, data={self.data!r})"
+
+
+class ConfigurationDisconnect:
+    """minecraft:disconnect (configuration clientbound 0x02)"""
+    __slots__ = ("reason",)
+    packet_id = 0x02
+
+    def __init__(self, reason: bytes):
+        self.reason = reason
+
+    @classmethod
+    def read(cls, buff: Stream) -> "ConfigurationDisconnect":
+        reason = buff.flush()
+        return cls(reason)
+
+    def write(self, buff: Stream):
+        buff.write(self.reason)
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"ConfigurationDisconnect(reason={self.reason!r})"
+
+
+class FinishConfiguration:
+    """minecraft:finish_configuration (configuration clientbound 0x03)"""
+    __slots__ = ()
+    packet_id = 0x03
+
+    def __init__(self):
+        pass
+
+    @classmethod
+    def read(cls, buff: Stream) -> "FinishConfiguration":
+        return cls()
+
+    def write(self, buff: Stream):
+        pass
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"FinishConfiguration()"
+
+
+class RegistryData:
+    """minecraft:registry_data (configuration clientbound 0x07)"""
+    __slots__ = ("registry", "entries")
+    packet_id = 0x07
+
+    def __init__(self, registry: str, entries: bytes):
+        self.registry = registry
+        self.entries = entries
+
+    @classmethod
+    def read(cls, buff: Stream) -> "RegistryData":
+        registry = buff.read_utf()
+        entries = buff.flush()
+        return cls(registry, entries)
+
+    def write(self, buff: Stream):
+        buff.write_utf(self.registry)
+        buff.write(self.entries)
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"RegistryData(registry={self.registry!r}, entries={self.entries!r})"
+
+
+class UpdateTags:
+    """minecraft:update_tags (configuration clientbound 0x0d)"""
+    __slots__ = ("tags",)
+    packet_id = 0x0d
+
+    def __init__(self, tags: bytes):
+        self.tags = tags
+
+    @classmethod
+    def read(cls, buff: Stream) -> "UpdateTags":
+        tags = buff.flush()
+        return cls(tags)
+
+    def write(self, buff: Stream):
+        buff.write(self.tags)
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"UpdateTags(tags={self.tags!r})"
+
+
+class SelectKnownPacks:
+    """minecraft:select_known_packs (configuration clientbound 0x0e)"""
+    __slots__ = ("packs",)
+    packet_id = 0x0e
+
+    def __init__(self, packs: bytes):
+        self.packs = packs
+
+    @classmethod
+    def read(cls, buff: Stream) -> "SelectKnownPacks":
+        packs = buff.flush()
+        return cls(packs)
+
+    def write(self, buff: Stream):
+        buff.write(self.packs)
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"SelectKnownPacks(packs={self.packs!r})"
+
+
+class FinishConfigurationAck:
+    """minecraft:finish_configuration (configuration serverbound 0x03)"""
+    __slots__ = ()
+    packet_id = 0x03
+
+    def __init__(self):
+        pass
+
+    @classmethod
+    def read(cls, buff: Stream) -> "FinishConfigurationAck":
+        return cls()
+
+    def write(self, buff: Stream):
+        pass
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"FinishConfigurationAck()"
+
+
+class SelectKnownPacksResponse:
+    """minecraft:select_known_packs (configuration serverbound 0x07)"""
+    __slots__ = ("pack_count",)
+    packet_id = 0x07
+
+    def __init__(self, pack_count: int):
+        self.pack_count = pack_count
+
+    @classmethod
+    def read(cls, buff: Stream) -> "SelectKnownPacksResponse":
+        pack_count = buff.read_varint()
+        return cls(pack_count)
+
+    def write(self, buff: Stream):
+        buff.write_varint(self.pack_count)
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"SelectKnownPacksResponse(pack_count={self.pack_count!r})"
+
+_ADD_ENTITY_3 = struct.Struct(">dddBBB")
+_ADD_ENTITY_5 = struct.Struct(">hhh")
+
+class AddEntity:
+    """minecraft:add_entity (play clientbound 0x01)"""
+    __slots__ = ("entity_id", "uuid", "entity_type", "x", "y", "z", "pitch", "yaw", "head_yaw", "data", "velocity_x", "velocity_y", "velocity_z")
+    packet_id = 0x01
+
+    def __init__(self, entity_id: int, uuid: UUID, entity_type: int, x: float, y: float, z: float, pitch: int, yaw: int, head_yaw: int, data: int, velocity_x: int, velocity_y: int, velocity_z: int):
+        self.entity_id = entity_id
+        self.uuid = uuid
+        self.entity_type = entity_type
+        self.x = x
+        self.y = y
+        self.z = z
+        self.pitch = pitch
+        self.yaw = yaw
+        self.head_yaw = head_yaw
+        self.data = data
+        self.velocity_x = velocity_x
+        self.velocity_y = velocity_y
+        self.velocity_z = velocity_z
+
+    @classmethod
+    def read(cls, buff: Stream) -> "AddEntity":
+        entity_id = buff.read_varint()
+        uuid = buff.read_uuid()
+        entity_type = buff.read_varint()
+        x, y, z, pitch, yaw, head_yaw, = buff.unpack(_ADD_ENTITY_3)
+        data = buff.read_varint()
+        velocity_x, velocity_y, velocity_z, = buff.unpack(_ADD_ENTITY_5)
+        return cls(entity_id, uuid, entity_type, x, y, z, pitch, yaw, head_yaw, data, velocity_x, velocity_y, velocity_z)
+
+    def write(self, buff: Stream):
+        buff.write_varint(self.entity_id)
+        buff.write_uuid(self.uuid)
+        buff.write_varint(self.entity_type)
+        buff.write(_ADD_ENTITY_3.pack(self.x, self.y, self.z, self.pitch, self.yaw, self.head_yaw))
+        buff.write_varint(self.data)
+        buff.write(_ADD_ENTITY_5.pack(self.velocity_x, self.velocity_y, self.velocity_z))
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"AddEntity(entity_id={self.entity_id!r}, uuid={self.uuid!r}, entity_type={self.entity_type!r}, x={self.x!r}, y={self.y!r}, z={self.z!r}, pitch={self.pitch!r}, yaw={self.yaw!r}, head_yaw={self.head_yaw!r}, data={self.data!r}, velocity_x={self.velocity_x!r}, velocity_y={self.velocity_y!r}, velocity_z={self.velocity_z!r})"
+
+
+class BlockUpdate:
+    """minecraft:block_update (play clientbound 0x09)"""
+    __slots__ = ("position", "block_state")
+    packet_id = 0x09
+
+    def __init__(self, position: Tuple[int, int, int], block_state: int):
+        self.position = position
+        self.block_state = block_state
+
+    @classmethod
+    def read(cls, buff: Stream) -> "BlockUpdate":
+        position = buff.read_position()
+        block_state = buff.read_varint()
+        return cls(position, block_state)
+
+    def write(self, buff: Stream):
+        buff.write_position(self.position)
+        buff.write_varint(self.block_state)
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"BlockUpdate(position={self.position!r}, block_state={self.block_state!r})"
+
+
+class ChunkBatchFinished:
+    """minecraft:chunk_batch_finished (play clientbound 0x0c)"""
+    __slots__ = ("batch_size",)
+    packet_id = 0x0c
+
+    def __init__(self, batch_size: int):
+        self.batch_size = batch_size
+
+    @classmethod
+    def read(cls, buff: Stream) -> "ChunkBatchFinished":
+        batch_size = buff.read_varint()
+        return cls(batch_size)
+
+    def write(self, buff: Stream):
+        buff.write_varint(self.batch_size)
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"ChunkBatchFinished(batch_size={self.batch_size!r})"
+
+
+class ChunkBatchStart:
+    """minecraft:chunk_batch_start (play clientbound 0x0d)"""
+    __slots__ = ()
+    packet_id = 0x0d
+
+    def __init__(self):
+        pass
+
+    @classmethod
+    def read(cls, buff: Stream) -> "ChunkBatchStart":
+        return cls()
+
+    def write(self, buff: Stream):
+        pass
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"ChunkBatchStart()"
+
+
+class Disconnect:
+    """minecraft:disconnect (play clientbound 0x1d)"""
+    __slots__ = ("reason",)
+    packet_id = 0x1d
+
+    def __init__(self, reason: bytes):
+        self.reason = reason
+
+    @classmethod
+    def read(cls, buff: Stream) -> "Disconnect":
+        reason = buff.flush()
+        return cls(reason)
+
+    def write(self, buff: Stream):
+        buff.write(self.reason)
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"Disconnect(reason={self.reason!r})"
+
+_ENTITY_POSITION_SYNC_1 = struct.Struct(">ddddddff?")
+
+class EntityPositionSync:
+    """minecraft:entity_position_sync (play clientbound 0x20)"""
+    __slots__ = ("entity_id", "x", "y", "z", "velocity_x", "velocity_y", "velocity_z", "yaw", "pitch", "on_ground")
+    packet_id = 0x20
+
+    def __init__(self, entity_id: int, x: float, y: float, z: float, velocity_x: float, velocity_y: float, velocity_z: float, yaw: float, pitch: float, on_ground: bool):
+        self.entity_id = entity_id
+        self.x = x
+        self.y = y
+        self.z = z
+        self.velocity_x = velocity_x
+        self.velocity_y = velocity_y
+        self.velocity_z = velocity_z
+        self.yaw = yaw
+        self.pitch = pitch
+        self.on_ground = on_ground
+
+    @classmethod
+    def read(cls, buff: Stream) -> "EntityPositionSync":
+        entity_id = buff.read_varint()
+        x, y, z, velocity_x, velocity_y, velocity_z, yaw, pitch, on_ground, = buff.unpack(_ENTITY_POSITION_SYNC_1)
+        return cls(entity_id, x, y, z, velocity_x, velocity_y, velocity_z, yaw, pitch, on_ground)
+
+    def write(self, buff: Stream):
+        buff.write_varint(self.entity_id)
+        buff.write(_ENTITY_POSITION_SYNC_1.pack(self.x, self.y, self.z, self.velocity_x, self.velocity_y, self.velocity_z, self.yaw, self.pitch, self.on_ground))
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"EntityPositionSync(entity_id={self.entity_id!r}, x={self.x!r}, y={self.y!r}, z={self.z!r}, velocity_x={self.velocity_x!r}, velocity_y={self.velocity_y!r}, velocity_z={self.velocity_z!r}, yaw={self.yaw!r}, pitch={self.pitch!r}, on_ground={self.on_ground!r})"
+
+_FORGET_LEVEL_CHUNK_0 = struct.Struct(">ii")
+
+class ForgetLevelChunk:
+    """minecraft:forget_level_chunk (play clientbound 0x22)"""
+    __slots__ = ("z", "x")
+    packet_id = 0x22
+
+    def __init__(self, z: int, x: int):
+        self.z = z
+        self.x = x
+
+    @classmethod
+    def read(cls, buff: Stream) -> "ForgetLevelChunk":
+        z, x, = buff.unpack(_FORGET_LEVEL_CHUNK_0)
+        return cls(z, x)
+
+    def write(self, buff: Stream):
+        buff.write(_FORGET_LEVEL_CHUNK_0.pack(self.z, self.x))
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"ForgetLevelChunk(z={self.z!r}, x={self.x!r})"
+
+_KEEP_ALIVE_0 = struct.Struct(">q")
+
+class KeepAlive:
+    """minecraft:keep_alive (play clientbound 0x27)"""
+    __slots__ = ("keep_alive_id",)
+    packet_id = 0x27
+
+    def __init__(self, keep_alive_id: int):
+        self.keep_alive_id = keep_alive_id
+
+    @classmethod
+    def read(cls, buff: Stream) -> "KeepAlive":
+        keep_alive_id, = buff.unpack(_KEEP_ALIVE_0)
+        return cls(keep_alive_id)
+
+    def write(self, buff: Stream):
+        buff.write(_KEEP_ALIVE_0.pack(self.keep_alive_id))
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"KeepAlive(keep_alive_id={self.keep_alive_id!r})"
+
+_LEVEL_CHUNK_WITH_LIGHT_0 = struct.Struct(">ii")
+
+class LevelChunkWithLight:
+    """minecraft:level_chunk_with_light (play clientbound 0x28)"""
+    __slots__ = ("x", "z", "data")
+    packet_id = 0x28
+
+    def __init__(self, x: int, z: int, data: bytes):
+        self.x = x
+        self.z = z
+        self.data = data
+
+    @classmethod
+    def read(cls, buff: Stream) -> "LevelChunkWithLight":
+        x, z, = buff.unpack(_LEVEL_CHUNK_WITH_LIGHT_0)
+        data = buff.flush()
+        return cls(x, z, data)
+
+    def write(self, buff: Stream):
+        buff.write(_LEVEL_CHUNK_WITH_LIGHT_0.pack(self.x, self.z))
+        buff.write(self.data)
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"LevelChunkWithLight(x={self.x!r}, z={self.z!r}, data={self.data!r})"
+
+
+class LightUpdate:
+    """minecraft:light_update (play clientbound 0x2b)"""
+    __slots__ = ("x", "z", "data")
+    packet_id = 0x2b
+
+    def __init__(self, x: int, z: int, data: bytes):
+        self.x = x
+        self.z = z
+        self.data = data
+
+    @classmethod
+    def read(cls, buff: Stream) -> "LightUpdate":
+        x = buff.read_varint()
+        z = buff.read_varint()
+        data = buff.flush()
+        return cls(x, z, data)
+
+    def write(self, buff: Stream):
+        buff.write_varint(self.x)
+        buff.write_varint(self.z)
+        buff.write(self.data)
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"LightUpdate(x={self.x!r}, z={self.z!r}, data={self.data!r})"
+
+_LOGIN_0 = struct.Struct(">i?")
+
+class Login:
+    """minecraft:login (play clientbound 0x2c)"""
+    __slots__ = ("entity_id", "hardcore", "dimensions", "max_players", "view_distance", "simulation_distance", "spawn_info")
+    packet_id = 0x2c
+
+    def __init__(self, entity_id: int, hardcore: bool, dimensions: List[str], max_players: int, view_distance: int, simulation_distance: int, spawn_info: bytes):
+        self.entity_id = entity_id
+        self.hardcore = hardcore
+        self.dimensions = dimensions
+        self.max_players = max_players
+        self.view_distance = view_distance
+        self.simulation_distance = simulation_distance
+        self.spawn_info = spawn_info
+
+    @classmethod
+    def read(cls, buff: Stream) -> "Login":
+        entity_id, hardcore, = buff.unpack(_LOGIN_0)
+        dimensions = [buff.read_utf() for _ in range(buff.read_varint())]
+        max_players = buff.read_varint()
+        view_distance = buff.read_varint()
+        simulation_distance = buff.read_varint()
+        spawn_info = buff.flush()
+        return cls(entity_id, hardcore, dimensions, max_players, view_distance, simulation_distance, spawn_info)
+
+    def write(self, buff: Stream):
+        buff.write(_LOGIN_0.pack(self.entity_id, self.hardcore))
+        buff.write_varint(len(self.dimensions))
+        for item in self.dimensions:
+            buff.write_utf(item)
+        buff.write_varint(self.max_players)
+        buff.write_varint(self.view_distance)
+        buff.write_varint(self.simulation_distance)
+        buff.write(self.spawn_info)
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"Login(entity_id={self.entity_id!r}, hardcore={self.hardcore!r}, dimensions={self.dimensions!r}, max_players={self.max_players!r}, view_distance={self.view_distance!r}, simulation_distance={self.simulation_distance!r}, spawn_info={self.spawn_info!r})"
+
+_PLAYER_POSITION_1 = struct.Struct(">ddddddffi")
+
+class PlayerPosition:
+    """minecraft:player_position (play clientbound 0x42)"""
+    __slots__ = ("teleport_id", "x", "y", "z", "velocity_x", "velocity_y", "velocity_z", "yaw", "pitch", "flags")
+    packet_id = 0x42
+
+    def __init__(self, teleport_id: int, x: float, y: float, z: float, velocity_x: float, velocity_y: float, velocity_z: float, yaw: float, pitch: float, flags: int):
+        self.teleport_id = teleport_id
+        self.x = x
+        self.y = y
+        self.z = z
+        self.velocity_x = velocity_x
+        self.velocity_y = velocity_y
+        self.velocity_z = velocity_z
+        self.yaw = yaw
+        self.pitch = pitch
+        self.flags = flags
+
+    @classmethod
+    def read(cls, buff: Stream) -> "PlayerPosition":
+        teleport_id = buff.read_varint()
+        x, y, z, velocity_x, velocity_y, velocity_z, yaw, pitch, flags, = buff.unpack(_PLAYER_POSITION_1)
+        return cls(teleport_id, x, y, z, velocity_x, velocity_y, velocity_z, yaw, pitch, flags)
+
+    def write(self, buff: Stream):
+        buff.write_varint(self.teleport_id)
+        buff.write(_PLAYER_POSITION_1.pack(self.x, self.y, self.z, self.velocity_x, self.velocity_y, self.velocity_z, self.yaw, self.pitch, self.flags))
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"PlayerPosition(teleport_id={self.teleport_id!r}, x={self.x!r}, y={self.y!r}, z={self.z!r}, velocity_x={self.velocity_x!r}, velocity_y={self.velocity_y!r}, velocity_z={self.velocity_z!r}, yaw={self.yaw!r}, pitch={self.pitch!r}, flags={self.flags!r})"
+
+_SECTION_BLOCKS_UPDATE_0 = struct.Struct(">q")
+
+class SectionBlocksUpdate:
+    """minecraft:section_blocks_update (play clientbound 0x4e)"""
+    __slots__ = ("section", "blocks")
+    packet_id = 0x4e
+
+    def __init__(self, section: int, blocks: List[int]):
+        self.section = section
+        self.blocks = blocks
+
+    @classmethod
+    def read(cls, buff: Stream) -> "SectionBlocksUpdate":
+        section, = buff.unpack(_SECTION_BLOCKS_UPDATE_0)
+        blocks = [buff.read_varlong() for _ in range(buff.read_varint())]
+        return cls(section, blocks)
+
+    def write(self, buff: Stream):
+        buff.write(_SECTION_BLOCKS_UPDATE_0.pack(self.section))
+        buff.write_varint(len(self.blocks))
+        for item in self.blocks:
+            buff.write_varlong(item)
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"SectionBlocksUpdate(section={self.section!r}, blocks={self.blocks!r})"
+
+
+class SetChunkCacheCenter:
+    """minecraft:set_chunk_cache_center (play clientbound 0x58)"""
+    __slots__ = ("x", "z")
+    packet_id = 0x58
+
+    def __init__(self, x: int, z: int):
+        self.x = x
+        self.z = z
+
+    @classmethod
+    def read(cls, buff: Stream) -> "SetChunkCacheCenter":
+        x = buff.read_varint()
+        z = buff.read_varint()
+        return cls(x, z)
+
+    def write(self, buff: Stream):
+        buff.write_varint(self.x)
+        buff.write_varint(self.z)
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"SetChunkCacheCenter(x={self.x!r}, z={self.z!r})"
+
+_SET_DEFAULT_SPAWN_POSITION_1 = struct.Struct(">f")
+
+class SetDefaultSpawnPosition:
+    """minecraft:set_default_spawn_position (play clientbound 0x5b)"""
+    __slots__ = ("position", "angle")
+    packet_id = 0x5b
+
+    def __init__(self, position: Tuple[int, int, int], angle: float):
+        self.position = position
+        self.angle = angle
+
+    @classmethod
+    def read(cls, buff: Stream) -> "SetDefaultSpawnPosition":
+        position = buff.read_position()
+        angle, = buff.unpack(_SET_DEFAULT_SPAWN_POSITION_1)
+        return cls(position, angle)
+
+    def write(self, buff: Stream):
+        buff.write_position(self.position)
+        buff.write(_SET_DEFAULT_SPAWN_POSITION_1.pack(self.angle))
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"SetDefaultSpawnPosition(position={self.position!r}, angle={self.angle!r})"
+
+_SET_ENTITY_MOTION_1 = struct.Struct(">hhh")
+
+class SetEntityMotion:
+    """minecraft:set_entity_motion (play clientbound 0x5f)"""
+    __slots__ = ("entity_id", "velocity_x", "velocity_y", "velocity_z")
+    packet_id = 0x5f
+
+    def __init__(self, entity_id: int, velocity_x: int, velocity_y: int, velocity_z: int):
+        self.entity_id = entity_id
+        self.velocity_x = velocity_x
+        self.velocity_y = velocity_y
+        self.velocity_z = velocity_z
+
+    @classmethod
+    def read(cls, buff: Stream) -> "SetEntityMotion":
+        entity_id = buff.read_varint()
+        velocity_x, velocity_y, velocity_z, = buff.unpack(_SET_ENTITY_MOTION_1)
+        return cls(entity_id, velocity_x, velocity_y, velocity_z)
+
+    def write(self, buff: Stream):
+        buff.write_varint(self.entity_id)
+        buff.write(_SET_ENTITY_MOTION_1.pack(self.velocity_x, self.velocity_y, self.velocity_z))
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"SetEntityMotion(entity_id={self.entity_id!r}, velocity_x={self.velocity_x!r}, velocity_y={self.velocity_y!r}, velocity_z={self.velocity_z!r})"
+
+_SET_HEALTH_0 = struct.Struct(">f")
+_SET_HEALTH_2 = struct.Struct(">f")
+
+class SetHealth:
+    """minecraft:set_health (play clientbound 0x62)"""
+    __slots__ = ("health", "food", "saturation")
+    packet_id = 0x62
+
+    def __init__(self, health: float, food: int, saturation: float):
+        self.health = health
+        self.food = food
+        self.saturation = saturation
+
+    @classmethod
+    def read(cls, buff: Stream) -> "SetHealth":
+        health, = buff.unpack(_SET_HEALTH_0)
+        food = buff.read_varint()
+        saturation, = buff.unpack(_SET_HEALTH_2)
+        return cls(health, food, saturation)
+
+    def write(self, buff: Stream):
+        buff.write(_SET_HEALTH_0.pack(self.health))
+        buff.write_varint(self.food)
+        buff.write(_SET_HEALTH_2.pack(self.saturation))
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"SetHealth(health={self.health!r}, food={self.food!r}, saturation={self.saturation!r})"
+
+
+class AcceptTeleportation:
+    """minecraft:accept_teleportation (play serverbound 0x00)"""
+    __slots__ = ("teleport_id",)
+    packet_id = 0x00
+
+    def __init__(self, teleport_id: int):
+        self.teleport_id = teleport_id
+
+    @classmethod
+    def read(cls, buff: Stream) -> "AcceptTeleportation":
+        teleport_id = buff.read_varint()
+        return cls(teleport_id)
+
+    def write(self, buff: Stream):
+        buff.write_varint(self.teleport_id)
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"AcceptTeleportation(teleport_id={self.teleport_id!r})"
+
+_CHUNK_BATCH_RECEIVED_0 = struct.Struct(">f")
+
+class ChunkBatchReceived:
+    """minecraft:chunk_batch_received (play serverbound 0x09)"""
+    __slots__ = ("chunks_per_tick",)
+    packet_id = 0x09
+
+    def __init__(self, chunks_per_tick: float):
+        self.chunks_per_tick = chunks_per_tick
+
+    @classmethod
+    def read(cls, buff: Stream) -> "ChunkBatchReceived":
+        chunks_per_tick, = buff.unpack(_CHUNK_BATCH_RECEIVED_0)
+        return cls(chunks_per_tick)
+
+    def write(self, buff: Stream):
+        buff.write(_CHUNK_BATCH_RECEIVED_0.pack(self.chunks_per_tick))
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"ChunkBatchReceived(chunks_per_tick={self.chunks_per_tick!r})"
+
+
+class ClientCommand:
+    """minecraft:client_command (play serverbound 0x0a)"""
+    __slots__ = ("action",)
+    packet_id = 0x0a
+
+    def __init__(self, action: int):
+        self.action = action
+
+    @classmethod
+    def read(cls, buff: Stream) -> "ClientCommand":
+        action = buff.read_varint()
+        return cls(action)
+
+    def write(self, buff: Stream):
+        buff.write_varint(self.action)
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"ClientCommand(action={self.action!r})"
+
+
+class ClientTickEnd:
+    """minecraft:client_tick_end (play serverbound 0x0b)"""
+    __slots__ = ()
+    packet_id = 0x0b
+
+    def __init__(self):
+        pass
+
+    @classmethod
+    def read(cls, buff: Stream) -> "ClientTickEnd":
+        return cls()
+
+    def write(self, buff: Stream):
+        pass
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"ClientTickEnd()"
+
+_KEEP_ALIVE_RESPONSE_0 = struct.Struct(">q")
+
+class KeepAliveResponse:
+    """minecraft:keep_alive (play serverbound 0x1a)"""
+    __slots__ = ("keep_alive_id",)
+    packet_id = 0x1a
+
+    def __init__(self, keep_alive_id: int):
+        self.keep_alive_id = keep_alive_id
+
+    @classmethod
+    def read(cls, buff: Stream) -> "KeepAliveResponse":
+        keep_alive_id, = buff.unpack(_KEEP_ALIVE_RESPONSE_0)
+        return cls(keep_alive_id)
+
+    def write(self, buff: Stream):
+        buff.write(_KEEP_ALIVE_RESPONSE_0.pack(self.keep_alive_id))
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"KeepAliveResponse(keep_alive_id={self.keep_alive_id!r})"
+
+_MOVE_PLAYER_POS_0 = struct.Struct(">dddb")
+
+class MovePlayerPos:
+    """minecraft:move_player_pos (play serverbound 0x1c)"""
+    __slots__ = ("x", "y", "z", "flags")
+    packet_id = 0x1c
+
+    def __init__(self, x: float, y: float, z: float, flags: int):
+        self.x = x
+        self.y = y
+        self.z = z
+        self.flags = flags
+
+    @classmethod
+    def read(cls, buff: Stream) -> "MovePlayerPos":
+        x, y, z, flags, = buff.unpack(_MOVE_PLAYER_POS_0)
+        return cls(x, y, z, flags)
+
+    def write(self, buff: Stream):
+        buff.write(_MOVE_PLAYER_POS_0.pack(self.x, self.y, self.z, self.flags))
+
+    def to_buffer(self) -> Buffer:
+        """The packet id followed by the fields, ready to send"""
+        buff = Buffer()
+        buff.write_varint(self.packet_id)
+        self.write(buff)
+        return buff
+
+    def __repr__(self):
+        return f"MovePlayerPos(x={self.x!r}, y={self.y!r}, z={self.z!r}, flags={self.flags!r})"
+
+HANDSHAKE_SERVERBOUND: Dict[int, type] = {
+    0x00: Intention,
+}
+
+LOGIN_CLIENTBOUND: Dict[int, type] = {
+    0x00: LoginDisconnect,
+    0x01: EncryptionRequest,
+    0x02: LoginFinished,
+    0x03: LoginCompression,
+    0x04: CustomQuery,
+}
+
+LOGIN_SERVERBOUND: Dict[int, type] = {
+    0x00: Hello,
+    0x02: CustomQueryAnswer,
+    0x03: LoginAcknowledged,
+}
+
+CONFIGURATION_CLIENTBOUND: Dict[int, type] = {
+    0x01: CustomPayload,
+    0x02: ConfigurationDisconnect,
+    0x03: FinishConfiguration,
+    0x07: RegistryData,
+    0x0d: UpdateTags,
+    0x0e: SelectKnownPacks,
+}
+
+CONFIGURATION_SERVERBOUND: Dict[int, type] = {
+    0x03: FinishConfigurationAck,
+    0x07: SelectKnownPacksResponse,
+}
+
+PLAY_CLIENTBOUND: Dict[int, type] = {
+    0x01: AddEntity,
+    0x09: BlockUpdate,
+    0x0c: ChunkBatchFinished,
+    0x0d: ChunkBatchStart,
+    0x1d: Disconnect,
+    0x20: EntityPositionSync,
+    0x22: ForgetLevelChunk,
+    0x27: KeepAlive,
+    0x28: LevelChunkWithLight,
+    0x2b: LightUpdate,
+    0x2c: Login,
+    0x42: PlayerPosition,
+    0x4e: SectionBlocksUpdate,
+    0x58: SetChunkCacheCenter,
+    0x5b: SetDefaultSpawnPosition,
+    0x5f: SetEntityMotion,
+    0x62: SetHealth,
+}
+
+PLAY_SERVERBOUND: Dict[int, type] = {
+    0x00: AcceptTeleportation,
+    0x09: ChunkBatchReceived,
+    0x0a: ClientCommand,
+    0x0b: ClientTickEnd,
+    0x1a: KeepAliveResponse,
+    0x1c: MovePlayerPos,
+}
+
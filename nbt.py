@@ -1,38 +1,151 @@
-import logging
-from typing import List
-from connection import Buffer
+"""
+Uncompressed network NBT, where the root tag has no name.
+Compounds are read as dicts, lists as lists and byte, int and long arrays as NumPy arrays.
+"""
+from typing import Any, List
+from connection import Stream, BYTE, SHORT, INT, LONG, FLOAT, DOUBLE
 
-logging.getLogger().setLevel(logging.INFO)
+import numpy as np
 
-def read_nbt(buff: Buffer):
-    """Reads minimal uncompressed network NBT. Does not work with deeply nested data."""
-    if buff.remaining == 0: 
+TAG_END = 0
+TAG_BYTE = 1
+TAG_SHORT = 2
+TAG_INT = 3
+TAG_LONG = 4
+TAG_FLOAT = 5
+TAG_DOUBLE = 6
+TAG_BYTE_ARRAY = 7
+TAG_STRING = 8
+TAG_LIST = 9
+TAG_COMPOUND = 10
+TAG_INT_ARRAY = 11
+TAG_LONG_ARRAY = 12
+
+_NUMBERS = {TAG_BYTE: BYTE, TAG_SHORT: SHORT, TAG_INT: INT, TAG_LONG: LONG, TAG_FLOAT: FLOAT, TAG_DOUBLE: DOUBLE}
+_ARRAYS = {TAG_BYTE_ARRAY: np.dtype(">i1"), TAG_INT_ARRAY: np.dtype(">i4"), TAG_LONG_ARRAY: np.dtype(">i8")}
+_LIST_DTYPES = {TAG_BYTE: np.dtype(">i1"), TAG_SHORT: np.dtype(">i2"), TAG_INT: np.dtype(">i4"),
+                TAG_LONG: np.dtype(">i8"), TAG_FLOAT: np.dtype(">f4"), TAG_DOUBLE: np.dtype(">f8")}
+
+def read_nbt(buff: Stream, skip: bool = False) -> Any:
+    """
+    Reads one network NBT value, None for TAG_End (no value).
+    With skip the value is only moved past, which costs no more than reading the tag headers.
+    Nesting is tracked with an explicit stack so any depth can be read.
+    """
+    tag = buff.read_ubyte()
+    if tag == TAG_END:
+        return None
+
+    if tag != TAG_COMPOUND and tag != TAG_LIST:
+        return _read_value(buff, tag, skip)
+
+    root: List[Any] = [] # the finished root value ends up in here
+    # every open compound is [dict, name of the value being read] and every open list
+    # is [list, element tag, elements left]
+    stack: List[List[Any]] = [[root, None]]
+    _open(buff, tag, stack, skip)
+
+    while len(stack) > 1:
+        top = stack[-1]
+
+        if len(top) == 2: # compound
+            tag = buff.read_ubyte()
+            if tag == TAG_END:
+                _close(stack, skip)
+                continue
+
+            top[1] = _read_string(buff, skip)
+        else: # list
+            if top[2] == 0:
+                _close(stack, skip)
+                continue
+
+            top[2] -= 1
+            tag = top[1]
+
+        if tag == TAG_COMPOUND or tag == TAG_LIST:
+            _open(buff, tag, stack, skip)
+        else:
+            _store(stack[-1], _read_value(buff, tag, skip), skip)
+
+    return None if skip else root[0]
+
+def skip_nbt(buff: Stream):
+    """Moves past one network NBT value without building it"""
+    read_nbt(buff, skip=True)
+
+def _open(buff: Stream, tag: int, stack: List[List[Any]], skip: bool):
+    if tag == TAG_COMPOUND:
+        stack.append([None if skip else {}, None])
         return
-    
-    tag = buff.read(1)[0] # 1 byte always sent for TAG_Compound
-    assert tag == 0x0a, f"TAG_COMPOUND not found. Is {hex(tag)} valid network NBT?"
-    
-    return _read_nbt_helper(buff) #TODO: Return the NBT Tags and the data in a dictionary 
-
-def _read_nbt_helper(buff: Buffer):
-    if buff.remaining <= 2:
+
+    element = buff.read_ubyte()
+    length = buff.read_int()
+    dtype = _LIST_DTYPES.get(element)
+
+    if dtype is not None: # a list of numbers is read like an array
+        values = _read_array(buff, dtype, length, skip)
+        _store(stack[-1], None if skip else values.tolist(), skip)
+    else:
+        stack.append([None if skip else [], element, max(0, length)])
+
+def _close(stack: List[List[Any]], skip: bool):
+    value = stack.pop()[0]
+    _store(stack[-1], value, skip)
+
+def _store(parent: List[Any], value: Any, skip: bool):
+    if skip:
         return
-    
-    tag = buff.read(2)[0]
-    
-    match tag:
-        case 0: # TAG_End
-            return
-        case 8: # TAG_String
-            message = buff.read_utf()
-            return message
-        case 12: # TAG_Long_Array
-            name = buff.read_utf()
-            length = int.from_bytes(buff.read(4), 'big')
-            for i in range(length):
-                long = int.from_bytes(buff.read(8), 'big')
-        case _: # default 
-            #print(buff.read(40))
-            logging.error("read unhandled nbt tag") 
-    _read_nbt_helper(buff)
 
+    if len(parent) == 2 and isinstance(parent[0], dict):
+        parent[0][parent[1]] = value
+    else:
+        parent[0].append(value)
+
+def _read_value(buff: Stream, tag: int, skip: bool) -> Any:
+    number = _NUMBERS.get(tag)
+    if number is not None:
+        if skip:
+            buff.skip(number.size)
+            return None
+        return buff.unpack(number)[0]
+
+    if tag == TAG_STRING:
+        return _read_string(buff, skip)
+
+    dtype = _ARRAYS.get(tag)
+    if dtype is not None:
+        return _read_array(buff, dtype, buff.read_int(), skip)
+
+    raise ValueError(f"Invalid NBT tag {tag}")
+
+def _read_string(buff: Stream, skip: bool) -> str | None:
+    length = buff.read_ushort()
+    if skip:
+        buff.skip(length)
+        return None
+
+    # modified UTF-8, which only differs from UTF-8 for null and characters outside the BMP
+    return str(buff.read(length), "utf-8", errors="replace")
+
+def _read_array(buff: Stream, dtype: np.dtype, length: int, skip: bool) -> np.ndarray | None:
+    if skip:
+        buff.skip(max(0, length) * dtype.itemsize)
+        return None
+
+    # copied to native order so the value does not keep the packet alive
+    return np.frombuffer(buff.read(max(0, length) * dtype.itemsize), dtype=dtype).astype(dtype.newbyteorder("="))
+
+def component_text(component: Any) -> str:
+    """Plain text of a text component read from NBT, used for disconnect reasons"""
+    if isinstance(component, str):
+        return component
+    if isinstance(component, list):
+        return "".join(component_text(part) for part in component)
+    if not isinstance(component, dict):
+        return f"{component}"
+
+    text = component.get("text", "") or component.get("translate", "")
+    if "with" in component:
+        text += " " + " ".join(component_text(part) for part in component["with"])
+    return text + "".join(component_text(part) for part in component.get("extra", []))
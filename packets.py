@@ -139,9 +139,138 @@ class Clientbound:
 
     @classmethod
     def for_id(cls, p_id: int) -> str:
-        for attr, value in cls.__dict__.items():
-            if not attr.startswith('__'):  # Ignore special attributes like __module__
-                if value == p_id:
-                    return attr
-        return ""
+        return CLIENTBOUND_NAMES.get(p_id, "")
 
+CLIENTBOUND_NAMES: Dict[int, str] = {
+    0x0: "bundle_delimiter",
+    0x1: "add_entity",
+    0x2: "add_experience_orb",
+    0x3: "animate",
+    0x4: "award_stats",
+    0x5: "block_changed_ack",
+    0x6: "block_destruction",
+    0x7: "block_entity_data",
+    0x8: "block_event",
+    0x9: "block_update",
+    0xa: "boss_event",
+    0xb: "change_difficulty",
+    0xc: "chunk_batch_finished",
+    0xd: "chunk_batch_start",
+    0xe: "chunks_biomes",
+    0xf: "clear_titles",
+    0x10: "command_suggestions",
+    0x11: "commands",
+    0x12: "container_close",
+    0x13: "container_set_content",
+    0x14: "container_set_data",
+    0x15: "container_set_slot",
+    0x16: "cookie_request",
+    0x17: "cooldown",
+    0x18: "custom_chat_completions",
+    0x19: "custom_payload",
+    0x1a: "damage_event",
+    0x1b: "debug_sample",
+    0x1c: "delete_chat",
+    0x1d: "disconnect",
+    0x1e: "disguised_chat",
+    0x1f: "entity_event",
+    0x20: "entity_position_sync",
+    0x21: "explode",
+    0x22: "forget_level_chunk",
+    0x23: "game_event",
+    0x24: "horse_screen_open",
+    0x25: "hurt_animation",
+    0x26: "initialize_border",
+    0x27: "keep_alive",
+    0x28: "level_chunk_with_light",
+    0x29: "level_event",
+    0x2a: "level_particles",
+    0x2b: "light_update",
+    0x2c: "login",
+    0x2d: "map_item_data",
+    0x2e: "merchant_offers",
+    0x2f: "move_entity_pos",
+    0x30: "move_entity_pos_rot",
+    0x31: "move_minecart_along_track",
+    0x32: "move_entity_rot",
+    0x33: "move_vehicle",
+    0x34: "open_book",
+    0x35: "open_screen",
+    0x36: "open_sign_editor",
+    0x37: "ping",
+    0x38: "pong_response",
+    0x39: "place_ghost_recipe",
+    0x3a: "player_abilities",
+    0x3b: "player_chat",
+    0x3c: "player_combat_end",
+    0x3d: "player_combat_enter",
+    0x3e: "player_combat_kill",
+    0x3f: "player_info_remove",
+    0x40: "player_info_update",
+    0x41: "player_look_at",
+    0x42: "player_position",
+    0x43: "player_rotation",
+    0x44: "recipe_book_add",
+    0x45: "recipe_book_remove",
+    0x46: "recipe_book_settings",
+    0x47: "remove_entities",
+    0x48: "remove_mob_effect",
+    0x49: "reset_score",
+    0x4a: "resource_pack_pop",
+    0x4b: "resource_pack_push",
+    0x4c: "respawn",
+    0x4d: "rotate_head",
+    0x4e: "section_blocks_update",
+    0x4f: "select_advancements_tab",
+    0x50: "server_data",
+    0x51: "set_action_bar_text",
+    0x52: "set_border_center",
+    0x53: "set_border_lerp_size",
+    0x54: "set_border_size",
+    0x55: "set_border_warning_delay",
+    0x56: "set_border_warning_distance",
+    0x57: "set_camera",
+    0x58: "set_chunk_cache_center",
+    0x59: "set_chunk_cache_radius",
+    0x5a: "set_cursor_item",
+    0x5b: "set_default_spawn_position",
+    0x5c: "set_display_objective",
+    0x5d: "set_entity_data",
+    0x5e: "set_entity_link",
+    0x5f: "set_entity_motion",
+    0x60: "set_equipment",
+    0x61: "set_experience",
+    0x62: "set_health",
+    0x63: "set_held_slot",
+    0x64: "set_objective",
+    0x65: "set_passengers",
+    0x66: "set_player_inventory",
+    0x67: "set_player_team",
+    0x68: "set_score",
+    0x69: "set_simulation_distance",
+    0x6a: "set_subtitle_text",
+    0x6b: "set_time",
+    0x6c: "set_title_text",
+    0x6d: "set_titles_animation",
+    0x6e: "sound_entity",
+    0x6f: "sound",
+    0x70: "start_configuration",
+    0x71: "stop_sound",
+    0x72: "store_cookie",
+    0x73: "system_chat",
+    0x74: "tab_list",
+    0x75: "tag_query",
+    0x76: "take_item_entity",
+    0x77: "teleport_entity",
+    0x78: "ticking_state",
+    0x79: "ticking_step",
+    0x7a: "transfer",
+    0x7b: "update_advancements",
+    0x7c: "update_attributes",
+    0x7d: "update_mob_effect",
+    0x7e: "update_recipes",
+    0x7f: "update_tags",
+    0x80: "projectile_power",
+    0x81: "custom_report_details",
+    0x82: "server_links",
+}
@@ -0,0 +1,231 @@
+"""
+Movement of every player of an event loop, stepped together once per tick.
+Bodies are kept as a structure of arrays so gravity, drag, friction and collisions cost a handful of
+NumPy operations over all of them, and one block gather per tick, however many players there are.
+"""
+import asyncio
+import weakref
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+import blocks
+from blocks import BlockRegistry
+from tick import tick_scheduler
+from world import World, gather_blocks
+
+GRAVITY = 0.08
+VERTICAL_DRAG = 0.98
+HORIZONTAL_DRAG = 0.91
+DEFAULT_FRICTION = 0.6
+WALK_SPEED = 0.1 # movement_speed attribute of players
+SPRINT_SPEED = 0.13
+AIR_ACCELERATION = 0.02
+JUMP_VELOCITY = 0.42
+MIN_VELOCITY = 0.003 # smaller velocities are zeroed every tick, like vanilla
+MAX_MOVEMENT = 10.0 # blocks per tick along each axis, bounds how many blocks a tick looks at
+WIDTH = 0.6
+HEIGHT = 1.8
+EPSILON = 1e-7
+
+# blocks without a collision box. Every other block collides as a full cube
+PASSABLE = ("air", "cave_air", "void_air", "water", "lava", "short_grass", "tall_grass", "fern",
+            "large_fern", "dead_bush", "seagrass", "tall_seagrass", "kelp", "kelp_plant", "vine",
+            "sugar_cane", "dandelion", "poppy", "blue_orchid", "allium", "azure_bluet", "red_tulip",
+            "orange_tulip", "white_tulip", "pink_tulip", "oxeye_daisy", "cornflower",
+            "lily_of_the_valley", "sunflower", "lilac", "rose_bush", "peony", "torch", "wall_torch",
+            "redstone_wire", "rail", "wheat", "carrots", "potatoes", "beetroots", "sweet_berry_bush",
+            "brown_mushroom", "red_mushroom", "glow_lichen", "hanging_roots", "cobweb")
+FRICTIONS = {"ice": 0.98, "packed_ice": 0.98, "frosted_ice": 0.98, "blue_ice": 0.989, "slime_block": 0.8}
+
+@lru_cache(maxsize=4)
+def block_physics(registry: BlockRegistry | None) -> Tuple[np.ndarray, np.ndarray]:
+    """Whether every state id collides, and its friction. Without a registry only air is passable"""
+    if registry is None:
+        return np.zeros(1, dtype=bool), np.full(1, DEFAULT_FRICTION)
+
+    solid = np.ones(len(registry), dtype=bool)
+    friction = np.full(len(registry), DEFAULT_FRICTION)
+    for name in PASSABLE:
+        solid[registry.state_ids(name)] = False
+    for name, value in FRICTIONS.items():
+        friction[registry.state_ids(name)] = value
+
+    return solid, friction
+
+def _lookup(table: np.ndarray, ids: np.ndarray, default) -> np.ndarray:
+    """Looks every state id up in a table, default for UNLOADED and ids past its end"""
+    known = (ids >= 0) & (ids < len(table))
+    return np.where(known, table[np.where(known, ids, 0)], default)
+
+class PhysicsEngine:
+    """
+    Positions (of the feet), velocities in blocks per tick, walking input and on ground flags of
+    every body, one row per body. step moves them the way the vanilla client moves a player:
+    walking accelerates by the friction of the block below, the movement is cut short by the
+    first block in its way, one axis at a time with y first, then gravity and drag apply.
+    Bodies collide with full cubes only and do not step up, and bodies that have not been placed
+    by the server yet or whose chunk is not loaded stay where they are.
+    """
+    def __init__(self, capacity: int = 64):
+        self.position = np.zeros((capacity, 3))
+        self.velocity = np.zeros((capacity, 3))
+        self.input = np.zeros((capacity, 2)) # x and z of the walking direction, at most 1 long
+        self.speed = np.full(capacity, WALK_SPEED)
+        self.jumping = np.zeros(capacity, dtype=bool)
+        self.on_ground = np.zeros(capacity, dtype=bool)
+        self.horizontal_collision = np.zeros(capacity, dtype=bool)
+        self.active = np.zeros(capacity, dtype=bool) # placed by the server and moved every tick
+        self.worlds: List[World | None] = [None] * capacity
+        self._free: List[int] = list(range(capacity - 1, -1, -1))
+
+    def __len__(self):
+        return len(self.worlds) - len(self._free)
+
+    def add(self, world: World) -> int:
+        """Index of a new body in the arrays. It stays inactive until it is placed"""
+        if not self._free:
+            self._grow()
+
+        body = self._free.pop()
+        self.worlds[body] = world
+        self.position[body] = self.velocity[body] = 0
+        self.input[body] = 0
+        self.speed[body] = WALK_SPEED
+        self.jumping[body] = self.on_ground[body] = self.horizontal_collision[body] = False
+        self.active[body] = False
+        return body
+
+    def remove(self, body: int):
+        self.worlds[body] = None
+        self.active[body] = False
+        self._free.append(body)
+
+    def place(self, body: int, x: float, y: float, z: float):
+        """Moves a body to where the server says it is, which starts simulating it"""
+        self.position[body] = (x, y, z)
+        self.active[body] = True
+
+    def _grow(self):
+        old = len(self.worlds)
+        for name in ("position", "velocity", "input", "speed", "jumping", "on_ground",
+                     "horizontal_collision", "active"):
+            array = getattr(self, name)
+            grown = np.zeros((old * 2, *array.shape[1:]), dtype=array.dtype)
+            grown[:old] = array
+            setattr(self, name, grown)
+
+        self.speed[old:] = WALK_SPEED
+        self.worlds.extend([None] * old)
+        self._free.extend(range(old * 2 - 1, old - 1, -1))
+
+    def step(self, tick: int = 0):
+        """Advances every active body whose chunk is loaded by one tick"""
+        bodies, owners, worlds = self._loaded()
+        if len(bodies) == 0:
+            return
+
+        position, velocity = self.position[bodies], self.velocity[bodies]
+        on_ground = self.on_ground[bodies]
+        velocity[np.abs(velocity) < MIN_VELOCITY] = 0
+        velocity[:, 1] = np.where(self.jumping[bodies] & on_ground, JUMP_VELOCITY, velocity[:, 1])
+
+        # the box the movement can sweep through, accelerating can only make it longer by a little
+        low = position - (WIDTH / 2, 0, WIDTH / 2)
+        high = position + (WIDTH / 2, HEIGHT, WIDTH / 2)
+        reach = np.minimum(np.abs(velocity), MAX_MOVEMENT) + (1, 0, 1)
+        start = np.floor(low - reach - EPSILON).astype(np.int64)
+        end = np.floor(high + reach + EPSILON).astype(np.int64)
+        size = (end - start).max(axis=0) + 1
+        offsets = np.indices(size).reshape(3, -1).T
+        cells = start[:, None, :] + offsets[None, :, :]
+
+        below = np.floor(position - (0, 0.5000001, 0)).astype(np.int64)
+        ids = gather_blocks(worlds, np.concatenate((np.repeat(owners, len(offsets)), owners)),
+                            np.concatenate((cells.reshape(-1, 3), below)))
+        solid_table, friction_table = block_physics(blocks.registry())
+        solid = _lookup(solid_table, ids[:-len(bodies)], True).reshape(len(bodies), -1)
+        friction = _lookup(friction_table, ids[-len(bodies):], DEFAULT_FRICTION)
+
+        # walking, accelerating more with the grip of the ground
+        slip = np.where(on_ground, friction, 1.0)
+        acceleration = np.where(on_ground, self.speed[bodies] * (0.21600002 / slip ** 3), AIR_ACCELERATION)
+        walk = self.input[bodies]
+        walk = walk / np.maximum(1.0, np.hypot(walk[:, 0], walk[:, 1]))[:, None]
+        velocity[:, [0, 2]] += walk * acceleration[:, None]
+
+        movement = np.clip(velocity, -MAX_MOVEMENT, MAX_MOVEMENT)
+        moved = movement.copy()
+        cells = cells.astype(np.float64)
+        moved[:, 1] = _collide(low, high, cells, solid, moved[:, 1], np.ones(len(bodies), dtype=np.int64))
+        first = np.where(np.abs(movement[:, 0]) < np.abs(movement[:, 2]), 2, 0) # the longer one first
+        rows = np.arange(len(bodies))
+        for axis in (first, 2 - first):
+            moved[rows, axis] = _collide(low, high, cells, solid, moved[rows, axis], axis)
+
+        collided = np.abs(moved - movement) > EPSILON
+        self.position[bodies] = position + moved
+        self.on_ground[bodies] = collided[:, 1] & (movement[:, 1] < 0)
+        self.horizontal_collision[bodies] = collided[:, 0] | collided[:, 2]
+        velocity[collided] = 0
+
+        velocity[:, 1] = (velocity[:, 1] - GRAVITY) * VERTICAL_DRAG
+        velocity[:, [0, 2]] *= (slip * HORIZONTAL_DRAG)[:, None]
+        self.velocity[bodies] = velocity
+
+    def _loaded(self) -> Tuple[np.ndarray, np.ndarray, List[World]]:
+        """Active bodies whose chunk is loaded, the index of their world in the returned worlds"""
+        bodies = np.flatnonzero(self.active)
+        chunks = np.floor(self.position[bodies][:, [0, 2]]).astype(np.int64) >> 4
+        indices: Dict[int, int] = {}
+        worlds: List[World] = []
+        keep, owners = [], []
+
+        for body, (x, z) in zip(bodies.tolist(), chunks.tolist()):
+            world = self.worlds[body]
+            if world is None or (x, z) not in world.chunks:
+                continue
+
+            index = indices.get(id(world))
+            if index is None:
+                index = indices[id(world)] = len(worlds)
+                worlds.append(world)
+            keep.append(body)
+            owners.append(index)
+
+        return np.array(keep, dtype=np.int64), np.array(owners, dtype=np.int64), worlds
+
+def _collide(low: np.ndarray, high: np.ndarray, cells: np.ndarray, solid: np.ndarray,
+             movement: np.ndarray, axis: np.ndarray) -> np.ndarray:
+    """
+    Cuts the movement of every box along its axis short at the first solid cell in its way,
+    then moves the boxes (low and high are updated in place).
+    """
+    rows = np.arange(len(movement))
+    overlap = (cells < high[:, None, :] - EPSILON) & (cells + 1 > low[:, None, :] + EPSILON)
+    overlap[rows, :, axis] = True # only the other two axes have to overlap
+    blocking = solid & overlap.all(axis=2)
+
+    along = cells[rows, :, axis]
+    low_along, high_along = low[rows, axis][:, None], high[rows, axis][:, None]
+    ahead = np.where(blocking & (along >= high_along - EPSILON), along - high_along, np.inf).min(axis=1)
+    behind = np.where(blocking & (along + 1 <= low_along + EPSILON), along + 1 - low_along, -np.inf).max(axis=1)
+
+    movement = np.where(movement > 0, np.minimum(movement, np.maximum(ahead, 0)),
+                        np.maximum(movement, np.minimum(behind, 0)))
+    low[rows, axis] += movement
+    high[rows, axis] += movement
+    return movement
+
+_engines: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, PhysicsEngine]" = weakref.WeakKeyDictionary()
+
+def physics_engine() -> PhysicsEngine:
+    """The engine of the running loop, stepped by its tick scheduler before the players tick"""
+    loop = asyncio.get_running_loop()
+    engine = _engines.get(loop)
+
+    if engine is None:
+        engine = _engines[loop] = PhysicsEngine()
+        tick_scheduler().add_system(engine.step)
+    return engine
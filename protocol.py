@@ -2,14 +2,27 @@ import asyncio
 from dataclasses import dataclass
 import logging
 import json
-import datetime
-from typing import Dict, Tuple
+import math
+import os
+from typing import Awaitable, Callable, Dict, List, Set
+from uuid import UUID
 
-from player import AddEntity 
-from chunks import Chunk, read_chunk 
-from nbt import read_nbt
+import blocks
+from chunks import Chunk, air_ids
+from world import UNLOADED, World, chunk_store
+from chunkrate import ChunkRateController
+from physics import SPRINT_SPEED, WALK_SPEED, PhysicsEngine, physics_engine
+from tick import tick_scheduler
+from nbt import component_text, read_nbt
 from packets import Clientbound 
-from connection import Buffer, send, read, Connection
+from messages import (AcceptTeleportation, AddEntity, BlockUpdate, ChunkBatchFinished,
+                      ChunkBatchReceived, ClientCommand, CustomQuery, CustomQueryAnswer,
+                      EntityPositionSync, FinishConfigurationAck, ForgetLevelChunk, Hello,
+                      Intention, KeepAlive, KeepAliveResponse, Login, LoginAcknowledged,
+                      LoginCompression, MovePlayerPos, PlayerPosition, SectionBlocksUpdate,
+                      SelectKnownPacksResponse, SetChunkCacheCenter, SetDefaultSpawnPosition,
+                      SetEntityMotion, SetHealth)
+from connection import DOUBLE, INT, Buffer, BufferView, Stream, send, read, packet_id, Connection
 
 logging.getLogger().setLevel(logging.DEBUG)
 
@@ -24,26 +37,17 @@ class Colors:
     BOLD = '\033[1m'
     UNDERLINE = '\033[4m'
 
-cache_pool = {}
+# how much of the world a Player keeps: nothing, the chunks around it or everything it is sent
+INTEREST_NONE = "none"
+INTEREST_RADIUS = "radius"
+INTEREST_FULL = "full"
+GROUND_EPSILON = 1e-3 # how far above a block the player can be while still standing on it
+WORLD_PACKETS = frozenset((Clientbound.level_chunk_with_light, Clientbound.light_update,
+                           Clientbound.block_update, Clientbound.section_blocks_update))
+
 def block_from_id(block_id: int) -> str:
-    blocks = cache_pool.get("blocks", None) 
-    
-    if blocks is None:
-        with open("./blocks.json", "r") as file:
-            blocks = json.load(file)
-            cache_pool["blocks"] = blocks 
-    
-    assert blocks is not None, "blocks registry missing"
-
-    for block_name in blocks:
-        data = blocks[block_name]
-        for state in data["states"]:
-            if state["id"] == block_id:
-                name_parts = block_name.split(":") # [minecraft:, block_name]
-                assert len(name_parts) > 1, "Unsupported version, block names are too small"
-                return name_parts[1] 
-    
-    return f"{block_id}" 
+    registry = blocks.registry()
+    return f"{block_id}" if registry is None else registry.name(block_id)
 
 def serialize_packet(p_id: int) -> str:
     return Clientbound.for_id(p_id)
@@ -54,179 +58,402 @@ class Vec:
     y: float
     z: float
 
+def handles(*p_ids: int):
+    """Registers a Player method as the handler of the given play state packet ids"""
+    def register(handler: Callable[..., Awaitable[None]]):
+        handler.handles = p_ids
+        return handler
+
+    return register
+
+def handler_table(cls: type) -> Dict[int, str]:
+    """Maps packet ids to the names of the @handles methods of a class and its bases"""
+    table = {}
+
+    for klass in reversed(cls.__mro__):
+        for attr, value in vars(klass).items():
+            for p_id in getattr(value, "handles", ()):
+                table[p_id] = attr
+
+    return table
+
 class Player():
+    """
+    Subclasses add or replace packet handlers by decorating methods with @handles.
+    handlers maps every packet id to the name of the method that handles it.
+    """
+    handlers: Dict[int, str] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.handlers = handler_table(cls)
+
     def __init__(self, name="Bot") -> None:
         self.name = name
+        self.dispatch = {p_id: getattr(self, attr) for p_id, attr in self.handlers.items()}
         self.connection = None
         self.entity_id = 0
         self.health = 20
-        self.tps = 20 # ticks per second
-        self.dx = 0
-        self.is_flying = False
-        self.chunks: Dict[Tuple[int, int], Chunk] = {}
+        self._position = Vec(0, 0, 0) # kept by the physics engine once the player is in the play state
+        self._delta_movement = Vec(0, 0, 0) # blocks per tick
+        self.physics: PhysicsEngine | None = None
+        self.body: int | None = None # row of the player in the physics engine
+        self._sent: tuple | None = None # last position and flags sent in move_player_pos
+        self._sent_tick = 0
+        self.yaw = 0.0
+        self.pitch = 0.0
+        self.world = World(store=chunk_store()) # chunks are shared with every player of the process
+        self.joined = asyncio.Event() # set once the player reaches the play state
+        self.record: str | None = None # directory level_chunk_with_light packets are saved to, for bench.py decode
+        self.offload_chunks = True # decode chunks on the worker pool instead of between packets
+        self.chunk_rate = ChunkRateController()
+        self.interest = INTEREST_FULL # chunks outside the interest are dropped as they are received
+        self.interest_radius = 2 # chunks around the player kept with INTEREST_RADIUS
+        self.center = (0, 0) # chunk the player is in, from set_chunk_cache_center
+        self._batch: List[asyncio.Task] = [] # chunks of the current batch still being decoded
+        self._acknowledgements: Set[asyncio.Task] = set()
 
-    async def on_ground(self):
-        return False
-    
-    async def getBlockBelow(self):
-        return 0
-    
-    def calculate_movement(self, vec: Vec, friction: float) -> Vec:
-        return vec 
-    
-    def get_effective_gravity(self):
-        return 0 if self.is_flying else 0.4
-    
-    def travel(self, vec: Vec):
-        block_below = self.getBlockBelow()
-        friction: float = 1.0 if self.on_ground() else 1.0 # else block_below.friction()
-        dampened: float = friction * 0.91
-        #TODO: add potion effects to gravity such as levitation. Add swimming.
-
-        new_vec: Vec = self.calculate_movement(vec, friction)
-        y_copy: float = new_vec.y
-        y_copy -= self.get_effective_gravity() 
-        self.delta_movement = Vec(new_vec.x * dampened, y_copy * 0.98, new_vec.z * dampened)
+    @property
+    def position(self) -> Vec:
+        if self.body is None:
+            return self._position
+
+        x, y, z = self.physics.position[self.body].tolist()
+        return Vec(x, y, z)
+
+    @position.setter
+    def position(self, position: Vec):
+        if self.body is None:
+            self._position = position
+        else:
+            self.physics.position[self.body] = (position.x, position.y, position.z)
+
+    @property
+    def delta_movement(self) -> Vec:
+        if self.body is None:
+            return self._delta_movement
+
+        x, y, z = self.physics.velocity[self.body].tolist()
+        return Vec(x, y, z)
+
+    @delta_movement.setter
+    def delta_movement(self, velocity: Vec):
+        if self.body is None:
+            self._delta_movement = velocity
+        else:
+            self.physics.velocity[self.body] = (velocity.x, velocity.y, velocity.z)
+
+    def on_ground(self) -> bool:
+        """Whether the player stands on top of a block that is not air"""
+        if self.body is not None and self.physics.active[self.body]:
+            return bool(self.physics.on_ground[self.body])
+
+        x, z = math.floor(self.position.x), math.floor(self.position.z)
+        surface = self.world.surface_at(x, z)
+
+        if surface is None or self.position.y > surface + 1 + GROUND_EPSILON:
+            return False # higher than every block of the column, no need to look at the blocks
+
+        if self.position.y - math.floor(self.position.y) >= GROUND_EPSILON:
+            return False # between two block heights
+
+        block = self.getBlockBelow()
+        return block != UNLOADED and block not in air_ids(blocks.registry())
     
-    async def serverbound(self, connection):
-        while True:
-            logging.debug("walking forwards") 
-            await asyncio.sleep(0.05)
+    def getBlockBelow(self) -> int:
+        """State id of the block under the player's feet, UNLOADED if its chunk is not loaded"""
+        return self.world.block_at(math.floor(self.position.x), math.floor(self.position.y - GROUND_EPSILON),
+                                   math.floor(self.position.z))
+
+    def walk(self, x: float, z: float, sprint: bool = False):
+        """Walks towards the direction x, z every tick until walk(0, 0). Longer directions are shortened to 1"""
+        assert self.body is not None, "only players in the play state can walk"
+        self.physics.input[self.body] = (x, z)
+        self.physics.speed[self.body] = SPRINT_SPEED if sprint else WALK_SPEED
+
+    def jump(self, jumping: bool = True):
+        """Jumps whenever the player lands until jump(False)"""
+        assert self.body is not None, "only players in the play state can jump"
+        self.physics.jumping[self.body] = jumping
+
+    def _join_physics(self):
+        self.physics = physics_engine()
+        self.body = self.physics.add(self.world)
+        self.position, self.delta_movement = self._position, self._delta_movement
+
+    def _leave_physics(self):
+        if self.body is None:
+            return
+
+        position, velocity = self.position, self.delta_movement
+        self.physics.remove(self.body)
+        self.body = None
+        self.position, self.delta_movement = position, velocity
+
+    def teleport(self, position: Vec, velocity: Vec, yaw: float, pitch: float, flags: int = 0):
+        """Applies a player_position sync. Each flag bit makes one field relative to the current value"""
+        old, delta = self.position, self.delta_movement
+        self.position = Vec(position.x + old.x if flags & 0x01 else position.x,
+                            position.y + old.y if flags & 0x02 else position.y,
+                            position.z + old.z if flags & 0x04 else position.z)
+        self.yaw = yaw + self.yaw if flags & 0x08 else yaw
+        self.pitch = pitch + self.pitch if flags & 0x10 else pitch
+        self.delta_movement = Vec(velocity.x + delta.x if flags & 0x20 else velocity.x,
+                                  velocity.y + delta.y if flags & 0x40 else velocity.y,
+                                  velocity.z + delta.z if flags & 0x80 else velocity.z)
+
+        if self.body is not None:
+            position = self.position
+            self.physics.place(self.body, position.x, position.y, position.z)
+
+    def tick(self, tick: int):
+        """
+        Called by the tick scheduler once per tick, after physics moved the player and before every
+        connection is flushed. Like the vanilla client the position is sent when it changed, when
+        the player landed or hit a wall, and at least once a second.
+        """
+        if self.body is None or self.connection is None or not self.physics.active[self.body]:
+            return
+
+        x, y, z = self.physics.position[self.body].tolist()
+        flags = int(self.physics.on_ground[self.body]) | int(self.physics.horizontal_collision[self.body]) << 1
+        sent = self._sent
+        if (sent is not None and sent[3] == flags and tick - self._sent_tick < 20
+                and (x - sent[0]) ** 2 + (y - sent[1]) ** 2 + (z - sent[2]) ** 2 <= 4e-8):
+            return
+
+        self._sent, self._sent_tick = (x, y, z, flags), tick
+        self.connection.queue(MovePlayerPos(x, y, z, flags).to_buffer())
+
+    def flush(self):
+        """Sends everything queued during the tick as one write"""
+        if self.connection is not None:
+            self.connection.flush()
     
-    async def clientbound(self, connection):
-        """ Play state packets. The player is logged in, loaded, and configured """ 
+    def wants(self, p_id: int, body: memoryview) -> bool:
+        """Frame filter applying the interest, body is the start of the packet after its id"""
+        if p_id == Clientbound.set_chunk_cache_center:
+            # frames are filtered as they arrive, long before the handler runs, so the chunks sent
+            # right after a move have to be checked against the new center already
+            center = SetChunkCacheCenter.read(BufferView(body))
+            self.center = (center.x, center.z)
+            return True
+        if p_id == Clientbound.light_update and not self.world.light:
+            return False # never read
+        if p_id not in WORLD_PACKETS or self.interest == INTEREST_FULL:
+            return True
+        if self.interest == INTEREST_NONE:
+            return False
+
+        if p_id == Clientbound.level_chunk_with_light:
+            if len(body) < 8:
+                return True
+            x, z = INT.unpack_from(body, 0)[0], INT.unpack_from(body, 4)[0]
+        elif p_id == Clientbound.light_update:
+            position = BufferView(body)
+            x, z = position.read_varint(), position.read_varint()
+        else:
+            return True # the world ignores updates to chunks it does not have
+
+        return max(abs(x - self.center[0]), abs(z - self.center[1])) <= self.interest_radius
+
+    async def clientbound(self, connection: Connection):
+        """
+        Play state packets. The player is logged in, loaded, and configured.
+        Packets without a handler are dropped before they are wrapped in a buffer.
+        """
         important = [0x28, 0x0d, 0x4c, 0x4e, 0x58, 0x09, 0x0c, 0x0d, 0x0e] 
+        dispatch = self.dispatch
 
         while True:
-            p_id, buff = await read(connection)
-            if p_id in important:
-                logging.debug(Colors.OKGREEN + f"S->C (Play): {serialize_packet(p_id)}" + Colors.ENDC)
-            elif p_id not in [0x6b]:
-                logging.debug(f"S->C (Play): {serialize_packet(p_id)}")
-            
-            if p_id == 0x1d:
-                handle_disconnect(buff, nbt=True) 
-            elif p_id == Clientbound.set_default_spawn_position:
-                # set spawn position
-                logging.debug("S->C (Play): Set spawn position")
-                position = int.from_bytes(buff.read(11), byteorder="big")
-                
-                x = position >> 38
-                y = position << 52 >> 52
-                z = position << 26 >> 38
-                # ok here
-            elif p_id == 0x22: # minecraft:forget_level_chunk
-                z = buff.read_int()
-                x = buff.read_int() # coordinates divided by 16 rounded down
-                if (x, z) in self.chunks:
-                    del self.chunks[(x, z)]
-            elif p_id == 0x0d: # minecraft:chunk_batch_start
-                datetime.datetime.now()
-            elif p_id == 0x28: # minecraft:level_chunk_with_light
-                chunk: Chunk = read_chunk(block_from_id, buff) 
-                self.chunks[(0, 0)] = chunk 
-                logging.debug(chunk.block_at(0, 0, 0))
-            elif p_id == 0x01: # minecraft:add_entity
-                entity: AddEntity = AddEntity.read(buff)
-                logging.debug(f"entity_id={entity.entity_id} entity_type={entity.entity_type}")
-                logging.debug(f"position={entity.x},{entity.y},{entity.z}") 
-            elif p_id == 0x0c: # minecraft:chunk_batch_finished
-                batch_size = buff.read_varint()
-                assert self.connection is not None
-                buffer = Buffer()
-                buffer.write_varint(0x09)
-                buffer.write_float(9) # chunks per tick
-                await send(connection, buffer)
-                logging.debug(f"(Chunk): Chunk received and acknowledge batch_size={batch_size}") 
-            elif p_id == 0x42: # minecraft:teleport_entity
-                logging.debug("S->C (Play): Sync position")
-                x = buff.read_double()
-                y = buff.read_double()
-                z = buff.read_double()
-                dx = buff.read_double()
-                dy = buff.read_double()
-                dz = buff.read_double()
-                yaw = buff.read_float()
-                pitch = buff.read_float()
-                flags = buff.read_int()
-
-                logging.debug("Confirming teleportation...")
-                teleport_id = buff.read_varint()
-                res = Buffer()
-                res.write_varint(0x00)
-                res.write_varint(teleport_id)
-                await send(connection, res)
-                logging.debug("C->S (Play): Teleport confirmed")
-                # ok 
-            elif p_id == 0x20:
-                entity_id = buff.read_varint()
-                x = buff.read_double()
-                y = buff.read_double()
-                z = buff.read_double()
-                dx = buff.read_double()
-                dy = buff.read_double()
-                dz = buff.read_double()
-                
-                yaw = buff.read_float()
-                pitch = buff.read_float()
-                on_ground = buff.read_bool()
-            elif p_id == 0x2c: # entity log in event
-                logging.debug("S->C (Play): Entity Log In")
-                self.entity_id = buff.read_int()
-                buff.read_bool()
-                dim_count = buff.read_varint() # dimension count
-                for i in range(dim_count):
-                    buff.read_utf()
-
-                buff.read_varint() # max pS->C s
-                view_dist = buff.read_varint() # view distance
-                logging.debug(f"View distance is set to {view_dist}")
-            elif p_id == 0x00: # bundle delimiter
-                pass
-            elif p_id == 0x09:
-                val = buff.read_longlong()
-                x = val >> 38;
-                y = val << 52 >> 52;
-                z = val << 26 >> 38;
-                logging.debug(f"S->C (Play): Block Update ({x}, {y}, {z})")
-            elif p_id == 0x27:
-                keep_alive_id = buff.read_longlong()
-                logging.debug(f"keep_alive_id={keep_alive_id}")
-                buff = Buffer()
-                buff.write_varint(0x1a)
-                buff.write_longlong(keep_alive_id) 
-                await send(connection, buff)
-            elif p_id == 0x62:
-                health = buff.read_float()
-                logging.debug(f"setting health to {health}")
-                if health <= 0:
-                    await self.respawn()
-                else:
-                    self.health = health
+            frame = await connection.read_frame()
+            p_id, offset = packet_id(frame)
+
+            if logging.root.isEnabledFor(logging.DEBUG):
+                if p_id in important:
+                    logging.debug(Colors.OKGREEN + f"S->C (Play): {serialize_packet(p_id)}" + Colors.ENDC)
+                elif p_id not in [0x6b]:
+                    logging.debug(f"S->C (Play): {serialize_packet(p_id)}")
+
+            handler = dispatch.get(p_id)
+            if handler is not None:
+                await handler(BufferView(frame, offset))
+
+    @handles(Clientbound.disconnect)
+    async def on_disconnect(self, buff: BufferView):
+        handle_disconnect(buff, nbt=True) 
+
+    @handles(Clientbound.set_default_spawn_position)
+    async def on_set_default_spawn_position(self, buff: BufferView):
+        spawn = SetDefaultSpawnPosition.read(buff)
+        logging.debug(f"S->C (Play): Set spawn position {spawn.position}")
+
+    @handles(Clientbound.forget_level_chunk)
+    async def on_forget_level_chunk(self, buff: BufferView):
+        forget = ForgetLevelChunk.read(buff) # coordinates divided by 16 rounded down
+        self.world.remove(forget.x, forget.z)
+
+    @handles(Clientbound.chunk_batch_start)
+    async def on_chunk_batch_start(self, buff: BufferView):
+        self.chunk_rate.start()
+
+    @handles(Clientbound.level_chunk_with_light)
+    async def on_level_chunk_with_light(self, buff: BufferView):
+        if self.record is not None:
+            with open(os.path.join(self.record, f"chunk_{len(os.listdir(self.record))}.bin"), "wb") as file:
+                file.write(buff.view) # the whole packet including its id
+        data = buff.flush()
+
+        if self.offload_chunks:
+            self._batch.append(self.world.load(data)) # keep answering keep alives while it decodes
+        else:
+            chunk: Chunk = chunk_store().acquire(data, self.world.light)
+            self.world.add(chunk)
+
+    @handles(Clientbound.light_update)
+    async def on_light_update(self, buff: BufferView):
+        x, z = buff.read_varint(), buff.read_varint()
+        self.world.update_light(x, z, buff)
+
+    @handles(Clientbound.set_chunk_cache_center)
+    async def on_set_chunk_cache_center(self, buff: BufferView):
+        center = SetChunkCacheCenter.read(buff)
+        if self.connection is None or self.connection.protocol.frame_filter is None:
+            self.center = (center.x, center.z)
+        # with the filter wants moved the center when the frame arrived, a newer move may already
+        # be waiting behind this one, so it is the center the chunks still to come are checked with
+
+        if self.interest == INTEREST_RADIUS:
+            self.world.retain(*self.center, self.interest_radius)
+
+    @handles(Clientbound.add_entity)
+    async def on_add_entity(self, buff: BufferView):
+        entity: AddEntity = AddEntity.read(buff)
+        logging.debug(f"entity_id={entity.entity_id} entity_type={entity.entity_type}")
+        logging.debug(f"position={entity.x},{entity.y},{entity.z}") 
+
+    @handles(Clientbound.chunk_batch_finished)
+    async def on_chunk_batch_finished(self, buff: BufferView):
+        batch = ChunkBatchFinished.read(buff)
+        # acknowledged once decoded, so the rate measures decoding without holding up other packets
+        task = asyncio.create_task(self._acknowledge_batch(batch.batch_size, self._batch))
+        self._acknowledgements.add(task)
+        task.add_done_callback(self._acknowledgements.discard)
+        self._batch = []
+
+    async def _acknowledge_batch(self, batch_size: int, decoding: List[asyncio.Task]):
+        results = await asyncio.gather(*decoding, return_exceptions=True)
+        for task, result in zip(decoding, results):
+            if isinstance(result, Exception): # cancelled loads were dropped on purpose
+                logging.error(f"(Chunk): Failed to load {task.get_name()}", exc_info=result)
+
+        self.chunk_rate.finish(batch_size)
+        chunks_per_tick = self.chunk_rate.chunks_per_tick()
+
+        assert self.connection is not None
+        await send(self.connection, ChunkBatchReceived(chunks_per_tick).to_buffer())
+        logging.debug(f"(Chunk): Chunk received and acknowledge batch_size={batch_size} "
+                      f"chunks_per_tick={chunks_per_tick:.2f}")
+
+    @handles(Clientbound.player_position)
+    async def on_player_position(self, buff: BufferView):
+        logging.debug("S->C (Play): Sync position")
+        sync = PlayerPosition.read(buff)
+        self.teleport(Vec(sync.x, sync.y, sync.z),
+                      Vec(sync.velocity_x, sync.velocity_y, sync.velocity_z),
+                      sync.yaw, sync.pitch, sync.flags)
+
+        logging.debug("Confirming teleportation...")
+        assert self.connection is not None
+        await send(self.connection, AcceptTeleportation(sync.teleport_id).to_buffer())
+        logging.debug("C->S (Play): Teleport confirmed")
+
+    @handles(Clientbound.set_entity_motion)
+    async def on_set_entity_motion(self, buff: BufferView):
+        motion = SetEntityMotion.read(buff)
+        if motion.entity_id == self.entity_id: # knockback, in 1/8000 blocks per tick
+            self.delta_movement = Vec(motion.velocity_x / 8000, motion.velocity_y / 8000, motion.velocity_z / 8000)
+
+    @handles(Clientbound.explode)
+    async def on_explode(self, buff: BufferView):
+        buff.skip(3 * DOUBLE.size) # center
+        if buff.read_bool(): # knockback of this player, added to its velocity
+            x, y, z = (buff.unpack(DOUBLE)[0] for _ in range(3))
+            velocity = self.delta_movement
+            self.delta_movement = Vec(velocity.x + x, velocity.y + y, velocity.z + z)
+
+    @handles(Clientbound.entity_position_sync)
+    async def on_entity_position_sync(self, buff: BufferView):
+        EntityPositionSync.read(buff)
+
+    @handles(Clientbound.login)
+    async def on_login(self, buff: BufferView):
+        logging.debug("S->C (Play): Entity Log In")
+        joined = Login.read(buff)
+        self.entity_id = joined.entity_id
+        logging.debug(f"View distance is set to {joined.view_distance}")
+
+    @handles(Clientbound.block_update)
+    async def on_block_update(self, buff: BufferView):
+        update = BlockUpdate.read(buff)
+        self.world.set_block(*update.position, update.block_state)
+        logging.debug(f"S->C (Play): Block Update {update.position}")
+
+    @handles(Clientbound.section_blocks_update)
+    async def on_section_blocks_update(self, buff: BufferView):
+        update = SectionBlocksUpdate.read(buff)
+        self.world.update_section(update.section, update.blocks)
+
+    @handles(Clientbound.keep_alive)
+    async def on_keep_alive(self, buff: BufferView):
+        keep_alive = KeepAlive.read(buff)
+        logging.debug(f"keep_alive_id={keep_alive.keep_alive_id}")
+        assert self.connection is not None
+        await send(self.connection, KeepAliveResponse(keep_alive.keep_alive_id).to_buffer())
+
+    @handles(Clientbound.set_health)
+    async def on_set_health(self, buff: BufferView):
+        health = SetHealth.read(buff).health
+        logging.debug(f"setting health to {health}")
+        if health <= 0:
+            await self.respawn()
+        else:
+            self.health = health
 
     async def connect(self, ip: str, port: int = 25565, timeout=2):
         """
-        Connects the player to a server.
+        Connects the player to a server. Every read and write yields to the event loop
+        so many players can be connected concurrently from the same loop.
         """
-        with Connection.create(ip, port) as connection:
+        async with await Connection.create(ip, port, timeout) as connection:
             self.connection = connection
             await login(connection, self.name, ip, port)
             await configure(self.connection)
             await self.respawn() 
             #asyncio.create_task(self.update_living()) 
             logging.debug("(Play): Now in play state")
+            self.joined.set()
             await self.chat("hello!")
+
+            if self.interest != INTEREST_FULL or not self.world.light:
+                connection.set_filter(self.wants) # light updates are dropped before they are decompressed
             
-            clientbound = asyncio.create_task(self.clientbound(connection))
-            serverbound = asyncio.create_task(self.serverbound(connection))
-            await asyncio.gather(clientbound, serverbound)  # Run both tasks concurrently
+            connection.batching = True # packets wait for the end of the tick
+            ticks = tick_scheduler()
+            self._join_physics()
+            ticks.add(self)
+            try:
+                await self.clientbound(connection)
+            finally:
+                ticks.remove(self)
+                self._leave_physics()
+                for task in self._acknowledgements:
+                    task.cancel()
+                self.world.clear()
         
     async def _send_status(self, status: int):
         assert self.connection is not None
-        buffer = Buffer()
-        buffer.write_varint(0x0a)
-        buffer.write_varint(status) 
-        await send(self.connection, buffer)
+        await send(self.connection, ClientCommand(status).to_buffer())
     
     async def respawn(self):
         assert self.connection is not None
@@ -234,6 +461,18 @@ class Player():
         self.health = 20
         logging.debug("C->S (Play): Client Action respawn state ready")
     
+    async def move(self, dx: float, dy: float, dz: float):
+        """Moves the player relative to its current position without checking for collisions"""
+        assert self.connection is not None
+        self.position = Vec(self.position.x + dx, self.position.y + dy, self.position.z + dz)
+        packet = MovePlayerPos(self.position.x, self.position.y, self.position.z, flags=0)
+        await send(self.connection, packet.to_buffer())
+
+    async def disconnect(self):
+        """Closes the connection, which ends connect()"""
+        if self.connection is not None:
+            await self.connection.close()
+
     async def chat(self, message: str):
         """
         Send a chat message to the console
@@ -252,9 +491,9 @@ class Player():
         
         await send(self.connection, packet)
     
-def handle_disconnect(packet: Buffer, nbt=False):
+def handle_disconnect(packet: Stream, nbt=False):
     if nbt:
-        message = read_nbt(packet)
+        message = component_text(read_nbt(packet))
         logging.error(f"Player disconnected: {message}")
         raise ConnectionResetError(f"{message}") 
     
@@ -262,7 +501,7 @@ def handle_disconnect(packet: Buffer, nbt=False):
     reason = {"translate": "unknown reason"}
 
     try:
-        reason = json.loads(packet.flush().decode("utf-8"))
+        reason = json.loads(str(packet.flush(), "utf-8"))
     except (UnicodeDecodeError, json.JSONDecodeError) as e:
         logging.error(f"Error parsing JSON: {e}")
     finally:
@@ -270,12 +509,15 @@ def handle_disconnect(packet: Buffer, nbt=False):
     
     raise ConnectionResetError(reason['translate'])
 
+Player.handlers = handler_table(Player)
+
 async def login(conn: Connection, name: str, ip: str, port: int = 25565):
     """
     C→S: Handshake with Next State set to 2 (login)
     C→S: Login Start
     S→C: Encryption Request
     C→S: Encryption Response
+    S→C: Set Compression (optional)
     S→C: Login Success
     C→S: Login Acknowledged
     """
@@ -283,35 +525,34 @@ async def login(conn: Connection, name: str, ip: str, port: int = 25565):
     logging.info(f"logging in {name} to {ip}:{port}") 
     
     logging.debug("C->S (Login): Handshake with Next State set to 2 (login)")
-    packet = Buffer()
-    packet.write_varint(0) # packet id
-    logging.debug(" 2")
-    packet.write_varint(769) # protocol version (769 for v1.21.4)
-    logging.debug(" 3")
-    packet.write_utf(ip) # ip address
-    logging.debug(" 4")
-    packet.write_ushort(port) # port
-    logging.debug(" 5")
-    packet.write_varint(2) # next state. login state is 2 
-    await send(conn, packet)
+    # protocol version 769 is v1.21.4, next state 2 is login
+    await send(conn, Intention(769, ip, port, 2).to_buffer())
     
     logging.debug("C->S (Login): Login Start")
-    packet = Buffer()
-    packet.write_varint(0) #packet id
-    packet.write_utf(name) # player's username
     # This is just set to an arbitrary UUID for now because it is not used on vanilla servers
-    packet.write(bytes.fromhex("de6078a856ec4cf9b8832a46025ae261")) # UUID of player's username (not used by offline servers)
-    await send(conn, packet)
+    await send(conn, Hello(name, UUID("de6078a856ec4cf9b8832a46025ae261")).to_buffer())
     
-    p_id, packet = await read(conn)
-    if p_id == 0x00:
-        handle_disconnect(packet) 
-    logging.debug("S->C (Login): Login Success")
+    while True:
+        p_id, packet = await read(conn)
+        if p_id == 0x00:
+            handle_disconnect(packet) 
+        elif p_id == 0x01:
+            raise ConnectionRefusedError("Encryption is not supported. Is the server in offline mode?")
+        elif p_id == 0x02:
+            logging.debug("S->C (Login): Login Success")
+            break
+        elif p_id == 0x03:
+            threshold = LoginCompression.read(packet).threshold
+            logging.debug(f"S->C (Login): Set Compression threshold={threshold}")
+            conn.set_compression(threshold)
+        elif p_id == 0x04:
+            logging.debug("S->C (Login): Login Plugin Request")
+            query = CustomQuery.read(packet)
+            # the channel is not understood so no payload is sent back
+            await send(conn, CustomQueryAnswer(query.message_id, has_payload=False).to_buffer())
     
     logging.debug("C->S (Login): Login Acknowledged") 
-    packet = Buffer()
-    packet.write_varint(0x03) # login acknowledgement packet
-    await send(conn, packet)
+    await send(conn, LoginAcknowledged().to_buffer())
     logging.debug("Logged in. Starting configuration.")
 
 async def configure(connection: Connection):
@@ -325,24 +566,17 @@ async def configure(connection: Connection):
             logging.debug("S->C (Configuration): Plugin Message")
         elif p_id == 0x02: 
             logging.debug("S->C (Configuration): Disconnect")
-            handle_disconnect(buff) 
+            handle_disconnect(buff, nbt=True) 
         elif p_id == 0x0e:
             logging.debug("S->C (Configuration): Known Packs")
-            res = Buffer()
-            res.write_varint(int(0x07))
-            res.write_varint(0)
-            await send(connection, res)
+            await send(connection, SelectKnownPacksResponse(pack_count=0).to_buffer())
             logging.debug("C->S (Configuration): Known Packs")
         elif p_id == 0x07:
-            logging.debug("S->C (Configuration): Identifier Message")
-            identifier = buff.read_utf()
-            pack_id = buff.read_utf()
+            logging.debug("S->C (Configuration): Registry Data")
         elif p_id == 0x0D:
             logging.debug("S->C (Configuration): Update Tags")
         elif p_id == 0x03:
             logging.debug("S->C (Configuration): Finish Configuration")
-            res = Buffer()
-            res.write_varint(0x03)
-            await send(connection, res)
+            await send(connection, FinishConfigurationAck().to_buffer())
             logging.debug("C->S (Configuration): Acknowledge Finish Configuration")
             configured = True
@@ -0,0 +1,229 @@
+"""
+Spread a swarm over worker processes, each running its own event loop, and control them
+from one supervisor. python shard.py 127.0.0.1 -n 1000 -w 4 runs 250 players per core.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+from functools import reduce
+from multiprocessing.connection import Connection as Pipe
+from typing import Dict, List
+
+import world
+from swarm import COMMANDS, Swarm, SwarmStats
+
+def _worker(pipe: Pipe, ip: str, port: int, start: int, count: int, rate: float,
+            prefix: str, restart: bool, report_interval: float, decoders: int):
+    """Runs one slice of the players and answers the supervisor over the pipe"""
+    logging.basicConfig(level=logging.WARNING, format=f"%(asctime)s worker {os.getpid()} %(message)s")
+    world.DECODE_WORKERS = decoders
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        swarm = Swarm(ip, port, count, rate, prefix, restart, report_interval=report_interval, start=start)
+        players = asyncio.create_task(swarm.run())
+
+        async def report():
+            while True:
+                await asyncio.sleep(report_interval)
+                pipe.send(("stats", swarm.stats()))
+
+        reporter = asyncio.create_task(report())
+
+        try:
+            while True:
+                # a blocking recv would stall the players, so it waits on a thread instead
+                message = await loop.run_in_executor(None, pipe.recv)
+                action, args, bot = message
+
+                if action == "stop":
+                    break
+                asyncio.create_task(swarm.command(action, *args, bot=bot))
+        finally:
+            reporter.cancel()
+            swarm.stop()
+            await asyncio.gather(players, return_exceptions=True)
+            try:
+                pipe.send(("stats", swarm.stats()))
+            except OSError:
+                pass
+
+    try:
+        asyncio.run(main())
+    except (EOFError, KeyboardInterrupt):
+        pass # the supervisor went away
+    finally:
+        world.shutdown_decode_executor()
+
+class Supervisor:
+    """
+    Splits count players evenly over worker processes. Commands are routed to the worker
+    that owns a player, or broadcast to every worker, and the stats every worker reports
+    are merged into one view.
+    """
+    def __init__(self, ip: str, port: int = 25565, count: int = 100, workers: int | None = None,
+                 rate: float = 5.0, prefix: str = "Bot", restart: bool = True,
+                 report_interval: float = 5.0):
+        self.ip = ip
+        self.port = port
+        self.count = count
+        self.workers = max(1, min(workers or os.cpu_count() or 1, count))
+        self.rate = rate # logins per second over every worker combined
+        self.prefix = prefix
+        self.restart = restart
+        self.report_interval = report_interval
+        self.owners: Dict[str, int] = {} # username to worker index
+        self._pipes: List[Pipe] = []
+        self._processes: List[multiprocessing.process.BaseProcess] = []
+        self._stats: List[SwarmStats] = []
+
+    def start(self):
+        context = multiprocessing.get_context("spawn")
+        per_worker, extra = divmod(self.count, self.workers)
+        # every worker decodes chunks on the cores left over from the other workers
+        decoders = max(0, min(world.DECODE_WORKERS, (os.cpu_count() or 1) // self.workers - 1))
+        start = 0
+
+        for index in range(self.workers):
+            count = per_worker + (index < extra)
+            pipe, child = context.Pipe()
+            # not daemonic, daemonic processes cannot start the chunk decode workers. stop joins them
+            process = context.Process(target=_worker, name=f"legion-worker-{index}",
+                                      args=(child, self.ip, self.port, start, count,
+                                            self.rate / self.workers, self.prefix,
+                                            self.restart, self.report_interval, decoders))
+            process.start()
+            child.close()
+
+            self._pipes.append(pipe)
+            self._processes.append(process)
+            self._stats.append(SwarmStats(players=count))
+            self.owners.update({f"{self.prefix}{i}": index for i in range(start, start + count)})
+            start += count
+
+    def send(self, action: str, *args, bot: str | None = None):
+        """Runs a command on one player, or on every joined player when bot is None"""
+        assert action in COMMANDS, f"Unknown command {action}"
+
+        if bot is None:
+            for pipe in self._pipes:
+                pipe.send((action, args, None))
+        else:
+            self._pipes[self.owners[bot]].send((action, args, bot))
+
+    def chat(self, message: str, bot: str | None = None):
+        self.send("chat", message, bot=bot)
+
+    def move(self, dx: float, dy: float, dz: float, bot: str | None = None):
+        self.send("move", dx, dy, dz, bot=bot)
+
+    def disconnect(self, bot: str | None = None):
+        self.send("disconnect", bot=bot)
+
+    def stats(self) -> SwarmStats:
+        return reduce(SwarmStats.merge, self._stats)
+
+    def poll(self):
+        """Collects every stats report the workers sent since the last poll"""
+        for index, pipe in enumerate(self._pipes):
+            try:
+                while pipe.poll():
+                    kind, stats = pipe.recv()
+                    if kind == "stats":
+                        self._stats[index] = stats
+            except (EOFError, OSError):
+                continue # the worker exited
+
+    async def run(self):
+        """Starts the workers and logs the merged stats until cancelled"""
+        self.start()
+
+        try:
+            while any(process.is_alive() for process in self._processes):
+                await asyncio.sleep(self.report_interval)
+                self.poll()
+                logging.info(f"{len(self._processes)} workers {self.stats()}")
+        finally:
+            self.stop()
+
+    def stop(self, timeout: float = 5.0):
+        for pipe in self._pipes:
+            try:
+                pipe.send(("stop", (), None))
+            except (BrokenPipeError, OSError):
+                pass
+
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+        self.poll()
+
+async def _console(supervisor: Supervisor):
+    """
+    Reads commands from stdin: chat <message>, move <dx> <dy> <dz>, disconnect, stats.
+    Prefix a command with @name to send it to a single player e.g. @Bot3 chat hi
+    """
+    loop = asyncio.get_running_loop()
+    lines: asyncio.Queue[str] = asyncio.Queue()
+
+    def read_lines():
+        for line in sys.stdin:
+            loop.call_soon_threadsafe(lines.put_nowait, line)
+
+    # a daemon thread so a pending read never keeps the process alive on exit
+    threading.Thread(target=read_lines, daemon=True).start()
+
+    while True:
+        words = (await lines.get()).split()
+        bot = words.pop(0)[1:] if words and words[0].startswith("@") else None
+
+        if not words:
+            continue
+        elif words[0] == "stats":
+            supervisor.poll()
+            print(supervisor.stats())
+        elif words[0] == "chat":
+            supervisor.chat(" ".join(words[1:]), bot=bot)
+        elif words[0] == "move" and len(words) == 4:
+            supervisor.move(*(float(word) for word in words[1:]), bot=bot)
+        elif words[0] == "disconnect":
+            supervisor.disconnect(bot=bot)
+        else:
+            print(_console.__doc__)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Connect players from one worker process per core")
+    parser.add_argument("ip", nargs="?", default="127.0.0.1", help="Server address")
+    parser.add_argument("-p", "--port", type=int, default=25565, help="Server port")
+    parser.add_argument("-n", "--count", type=int, default=100, help="Number of players")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes, one per core by default")
+    parser.add_argument("-r", "--rate", type=float, default=5.0, help="Logins per second over every worker")
+    parser.add_argument("--prefix", default="Bot", help="Prefix of the generated usernames")
+    parser.add_argument("--no-restart", action="store_true", help="Do not reconnect players that leave")
+    parser.add_argument("--report", type=float, default=5.0, help="Seconds between stats reports")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    supervisor = Supervisor(args.ip, args.port, args.count, args.workers, args.rate, args.prefix,
+                            restart=not args.no_restart, report_interval=args.report)
+
+    async def main():
+        console = asyncio.create_task(_console(supervisor))
+        try:
+            await supervisor.run()
+        finally:
+            console.cancel()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
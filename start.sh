@@ -5,6 +5,7 @@ SERVER_DIR="./server"
 SERVER_FILE="server.jar"
 EULA_FILE="eula.txt"
 PROPERTIES_FILE="server.properties"
+COMPRESSION_THRESHOLD="${COMPRESSION_THRESHOLD:-256}" # -1 disables packet compression
 
 mkdir -p "$SERVER_DIR"
 cd "$SERVER_DIR"
@@ -22,7 +23,7 @@ else
 fi
 
 sed -i 's/online-mode=true/online-mode=false/' "$PROPERTIES_FILE"
-sed -i 's/network-compression-threshold=256/network-compression-threshold=-1/' "$PROPERTIES_FILE"
+sed -i "s/network-compression-threshold=.*/network-compression-threshold=$COMPRESSION_THRESHOLD/" "$PROPERTIES_FILE"
 
 echo "Starting Minecraft server..."
 java -Xmx1024M -Xms1024M -jar "$SERVER_FILE" nogui
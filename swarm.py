@@ -0,0 +1,190 @@
+"""
+Run many players from a single event loop for load testing.
+python swarm.py 127.0.0.1 -n 100 -r 5 connects 100 players at 5 logins per second.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List
+
+import numpy as np
+
+from protocol import Player
+
+COMMANDS = ("chat", "move", "disconnect")
+
+@dataclass
+class SwarmStats:
+    """Live counts of a swarm plus the most recent join latencies in seconds"""
+    players: int = 0
+    connecting: int = 0
+    online: int = 0
+    disconnects: int = 0
+    restarts: int = 0
+    latencies: List[float] = field(default_factory=list)
+
+    def percentiles(self, *ranks: float) -> List[float]:
+        if not self.latencies:
+            return [0.0 for _ in ranks]
+
+        return [float(value) for value in np.percentile(self.latencies, ranks)]
+
+    def merge(self, other: "SwarmStats") -> "SwarmStats":
+        return SwarmStats(self.players + other.players,
+                          self.connecting + other.connecting,
+                          self.online + other.online,
+                          self.disconnects + other.disconnects,
+                          self.restarts + other.restarts,
+                          self.latencies + other.latencies)
+
+    def __str__(self):
+        p50, p90, p99 = self.percentiles(50, 90, 99)
+        return (f"online={self.online}/{self.players} connecting={self.connecting} "
+                f"disconnects={self.disconnects} restarts={self.restarts} "
+                f"join p50={p50:.2f}s p90={p90:.2f}s p99={p99:.2f}s")
+
+class Swarm:
+    """
+    Connects count players named prefix<start>, prefix<start + 1>... to one server from the
+    current loop.
+    Logins are paced to rate per second (the server throttles logins from one address) and
+    players that disconnect are restarted with an exponential backoff through the same pacer.
+    """
+    def __init__(self, ip: str, port: int = 25565, count: int = 10, rate: float = 5.0,
+                 prefix: str = "Bot", restart: bool = True, report_interval: float = 5.0,
+                 player: Callable[[str], Player] = Player, start: int = 0):
+        assert len(prefix) + len(str(start + count - 1)) <= 16, "Usernames cannot be longer than 16 characters"
+        assert rate > 0, "Login rate must be positive"
+
+        self.ip = ip
+        self.port = port
+        self.count = count
+        self.start = start # index of the first username
+        self.rate = rate
+        self.prefix = prefix
+        self.restart = restart
+        self.report_interval = report_interval
+        self.player = player
+        self.players: Dict[str, Player] = {}
+        self._stats = SwarmStats(players=count)
+        self._latencies: Deque[float] = deque(maxlen=1000)
+        self._next_login = 0.0
+        self._tasks: List[asyncio.Task] = []
+
+    def stats(self) -> SwarmStats:
+        self._stats.latencies = list(self._latencies)
+        return self._stats
+
+    async def _pace(self):
+        """Waits for this login's slot so logins never exceed the configured rate"""
+        now = time.monotonic()
+        slot = max(now, self._next_login)
+        self._next_login = slot + 1 / self.rate
+        await asyncio.sleep(slot - now)
+
+    async def _run_player(self, name: str):
+        backoff = 1.0
+
+        while True:
+            await self._pace()
+            player = self.player(name)
+            self.players[name] = player
+            self._stats.connecting += 1
+            started = time.monotonic()
+            connect = asyncio.create_task(player.connect(self.ip, self.port))
+            joined = asyncio.create_task(player.joined.wait())
+
+            try:
+                try:
+                    await asyncio.wait((connect, joined), return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    self._stats.connecting -= 1
+
+                if joined.done():
+                    self._latencies.append(time.monotonic() - started)
+                    self._stats.online += 1
+                    backoff = 1.0
+
+                    try:
+                        await connect
+                    except Exception as e:
+                        logging.warning(f"{name} disconnected: {e}")
+                    finally:
+                        self._stats.online -= 1
+                elif connect.exception() is not None:
+                    logging.warning(f"{name} failed to join: {connect.exception()}")
+            finally:
+                joined.cancel()
+                connect.cancel()
+
+            self._stats.disconnects += 1
+            self.players.pop(name, None)
+
+            if not self.restart:
+                return
+
+            self._stats.restarts += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            logging.info(f"swarm {self.stats()}")
+
+    async def run(self):
+        """Runs every player until they all stop, or forever when restarting is enabled"""
+        report = asyncio.create_task(self._report())
+        self._tasks = [asyncio.create_task(self._run_player(f"{self.prefix}{index}"))
+                       for index in range(self.start, self.start + self.count)]
+
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            report.cancel()
+
+    async def command(self, action: str, *args, bot: str | None = None):
+        """
+        Runs a Player coroutine method such as chat, move or disconnect on one player
+        or, without a bot name, on every player that has joined.
+        """
+        assert action in COMMANDS, f"Unknown command {action}"
+
+        if bot is None:
+            players = [player for player in self.players.values() if player.joined.is_set()]
+        else:
+            players = [self.players[bot]] if bot in self.players else []
+
+        results = await asyncio.gather(*(getattr(player, action)(*args) for player in players),
+                                       return_exceptions=True)
+        for player, result in zip(players, results):
+            if isinstance(result, Exception):
+                logging.warning(f"{player.name} failed to {action}: {result}")
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Connect many players to a server from one process")
+    parser.add_argument("ip", nargs="?", default="127.0.0.1", help="Server address")
+    parser.add_argument("-p", "--port", type=int, default=25565, help="Server port")
+    parser.add_argument("-n", "--count", type=int, default=10, help="Number of players")
+    parser.add_argument("-r", "--rate", type=float, default=5.0, help="Logins per second")
+    parser.add_argument("--prefix", default="Bot", help="Prefix of the generated usernames")
+    parser.add_argument("--no-restart", action="store_true", help="Do not reconnect players that leave")
+    parser.add_argument("--report", type=float, default=5.0, help="Seconds between stats reports")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    swarm = Swarm(args.ip, args.port, args.count, args.rate, args.prefix,
+                  restart=not args.no_restart, report_interval=args.report)
+    try:
+        asyncio.run(swarm.run())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,81 @@
+"""Frame filter of a Player with INTEREST_RADIUS, run with python -m pytest"""
+import asyncio
+import struct
+import unittest
+
+from connection import Buffer, BufferView, Connection, PacketProtocol, packet_id
+from packets import Clientbound
+from protocol import INTEREST_RADIUS, Player
+
+def _frame(p_id: int, body: bytes) -> bytes:
+    packet = Buffer()
+    packet.write_varint(p_id)
+    packet.write(body)
+    frame = Buffer()
+    frame.write_varint(len(packet))
+    frame.write(packet)
+    return bytes(frame)
+
+def _center(x: int, z: int) -> bytes:
+    body = Buffer()
+    body.write_varint(x)
+    body.write_varint(z)
+    return _frame(Clientbound.set_chunk_cache_center, bytes(body))
+
+def _chunk(x: int, z: int) -> bytes:
+    return _frame(Clientbound.level_chunk_with_light, struct.pack(">ii", x, z) + bytes(32))
+
+class InterestTest(unittest.TestCase):
+    def setUp(self):
+        self.player = Player("Bot")
+        self.player.interest = INTEREST_RADIUS
+        self.player.interest_radius = 1
+        self.protocol = PacketProtocol()
+        self.player.connection = Connection(None, self.protocol)
+        self.player.connection.set_filter(self.player.wants)
+
+    def receive(self, data: bytes):
+        """Delivers data the way the transport does, every frame is filtered as it arrives"""
+        self.protocol.get_buffer(len(data))[:len(data)] = data
+        self.protocol.buffer_updated(len(data))
+
+    def handle_next(self):
+        """Runs the handler of the oldest frame received, the way the play loop does"""
+        frame = self.protocol.frames.popleft()
+        p_id, offset = packet_id(frame)
+        asyncio.run(self.player.dispatch[p_id](BufferView(frame, offset)))
+
+    def kept_chunks(self):
+        chunks = []
+        for frame in self.protocol.frames:
+            if frame[0] == Clientbound.level_chunk_with_light:
+                chunks.append(struct.unpack_from(">ii", frame, 1))
+        return sorted(chunks)
+
+    def test_chunks_after_center_change_use_new_center(self):
+        # the center change and the chunks around it arrive in the same read, before any handler runs
+        self.receive(_center(5, 5) + b"".join(_chunk(x, z) for x in range(3, 8) for z in range(3, 8)))
+
+        expected = sorted((x, z) for x in range(4, 7) for z in range(4, 7))
+        self.assertEqual(self.kept_chunks(), expected)
+        self.assertEqual(self.protocol.dropped, 25 - 9)
+        self.assertEqual(self.player.center, (5, 5))
+
+    def test_chunks_before_center_change_use_old_center(self):
+        self.receive(_chunk(1, 0) + _chunk(5, 5) + _center(5, 5) + _chunk(1, 0) + _chunk(5, 5))
+        self.assertEqual(self.kept_chunks(), [(1, 0), (5, 5)])
+
+    def test_handling_an_older_center_keeps_the_newest(self):
+        # two moves wait in the backlog, handling the first must not bring its center back
+        self.receive(_center(0, 0) + _center(5, 5))
+        self.assertEqual(self.player.center, (5, 5))
+
+        self.handle_next()
+        self.assertEqual(self.player.center, (5, 5))
+
+        self.receive(_chunk(5, 5))
+        self.assertEqual(self.protocol.dropped, 0)
+        self.assertEqual(self.kept_chunks(), [(5, 5)])
+
+if __name__ == "__main__":
+    unittest.main()
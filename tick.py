@@ -0,0 +1,119 @@
+"""
+One 20 ticks per second clock for every player of an event loop.
+Every tick the systems such as physics run for all players at once, each player is ticked, then
+every connection is flushed, so a tick wakes the loop once however many players there are.
+"""
+import asyncio
+import logging
+import time
+import weakref
+from typing import Callable, Dict, List, Protocol
+
+TICK_NANOS = 50_000_000 # 20 ticks per second
+MAX_BEHIND = 40 # ticks the clock runs late before the missed ticks are skipped, like vanilla servers
+
+class Tickable(Protocol):
+    def tick(self, tick: int): ...
+    def flush(self): ...
+
+class TickScheduler:
+    """
+    Runs ticks on a fixed 50ms grid from when the first tickable is added until the last is removed.
+    A tick that starts late is an overrun. The ticks it fell behind are run back to back, yielding
+    in between so packets are still read, so every tick number runs once and in order. Only when
+    more than MAX_BEHIND ticks are due is the grid moved forward and those ticks skipped.
+    """
+    def __init__(self, tick_nanos: int = TICK_NANOS):
+        self.tick_nanos = tick_nanos
+        self.tick = 0 # number of the next tick to run
+        self.overruns = 0 # ticks that started more than a tick late
+        self.skipped = 0
+        self.late_nanos = 0 # how late the last tick started
+        self.busy_nanos = 0.0 # moving average of the time a tick takes
+        self._tickables: Dict[int, Tickable] = {} # by id, ticked in the order they were added
+        self._systems: List[Callable[[int], None]] = [] # work for every tickable at once, run first
+        self._task: asyncio.Task | None = None
+
+    def __len__(self):
+        return len(self._tickables)
+
+    def add(self, tickable: Tickable):
+        self._tickables[id(tickable)] = tickable
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    def add_system(self, system: Callable[[int], None]):
+        """Runs system(tick) at the start of every tick, before any tickable is ticked"""
+        self._systems.append(system)
+
+    def remove(self, tickable: Tickable):
+        self._tickables.pop(id(tickable), None)
+        if not self._tickables and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def run_tick(self):
+        """Runs the systems, ticks every tickable, then flushes them all. One failing does not stop the others"""
+        tick, self.tick = self.tick, self.tick + 1
+        tickables = list(self._tickables.values()) # removals during the tick apply from the next one
+
+        for system in self._systems:
+            try:
+                system(tick)
+            except Exception:
+                logging.exception(f"tick {tick} failed for {system}")
+
+        for tickable in tickables:
+            try:
+                tickable.tick(tick)
+            except Exception:
+                logging.exception(f"tick {tick} failed for {tickable}")
+
+        for tickable in tickables:
+            try:
+                tickable.flush()
+            except Exception:
+                logging.exception(f"flush failed for {tickable}")
+
+    async def run(self):
+        deadline = time.perf_counter_ns()
+
+        while True:
+            now = time.perf_counter_ns()
+            if deadline > now:
+                await asyncio.sleep((deadline - now) / 1e9)
+                now = time.perf_counter_ns()
+
+            self.late_nanos = now - deadline
+            behind = self.late_nanos // self.tick_nanos
+            if behind > MAX_BEHIND:
+                logging.warning(f"Can't keep up! Running {self.late_nanos / 1e6:.0f}ms or {behind} ticks behind")
+                self.skipped += behind
+                self.tick += behind
+                deadline += behind * self.tick_nanos
+            elif behind > 0:
+                self.overruns += 1
+
+            self.run_tick()
+            deadline += self.tick_nanos
+
+            busy = time.perf_counter_ns() - now
+            self.busy_nanos = (self.busy_nanos * 19 + busy) / 20
+
+            if deadline <= time.perf_counter_ns():
+                await asyncio.sleep(0) # catching up, let the packets received so far be handled first
+
+    def __str__(self):
+        return (f"tick={self.tick} tickables={len(self)} busy={self.busy_nanos / 1e6:.2f}ms "
+                f"late={self.late_nanos / 1e6:.2f}ms overruns={self.overruns} skipped={self.skipped}")
+
+_schedulers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, TickScheduler]" = weakref.WeakKeyDictionary()
+
+def tick_scheduler() -> TickScheduler:
+    """The scheduler of the running loop, shared by every player on it"""
+    loop = asyncio.get_running_loop()
+    scheduler = _schedulers.get(loop)
+
+    if scheduler is None:
+        scheduler = _schedulers[loop] = TickScheduler()
+    return scheduler
@@ -0,0 +1,441 @@
+"""Loaded chunks of a dimension, queried in world coordinates"""
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Iterator, List, Sequence, Set, Tuple
+
+import numpy as np
+
+import blocks
+from blocks import BlockRegistry
+from chunkrate import chunk_load
+from chunks import Chunk, air_ids, read_chunk
+from connection import INT, BufferView, Stream
+from light import read_light
+
+MIN_Y = -64 # overworld bottom on vanilla servers
+UNLOADED = -1 # blocks_at result for positions outside of any loaded section
+DECODE_WORKERS = min(4, (os.cpu_count() or 1) - 1) # spare cores, without any chunks decode on the loop
+
+_decode_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+_decode_executor: ProcessPoolExecutor | None = None
+
+def decode_executor() -> ProcessPoolExecutor:
+    """Process pool shared by every player, chunk decoding holds the GIL for most of its time"""
+    global _decode_executor
+
+    if _decode_executor is None:
+        _decode_executor = ProcessPoolExecutor(DECODE_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                                               initializer=_init_decode_worker)
+
+    return _decode_executor
+
+def shutdown_decode_executor():
+    """Stops the decode workers. A multiprocessing child waits for its own children when it exits"""
+    global _decode_executor
+
+    if _decode_executor is not None:
+        _decode_executor.shutdown(cancel_futures=True)
+        _decode_executor = None
+
+def _init_decode_worker():
+    logging.getLogger().setLevel(logging.WARNING) # the workers would otherwise log every chunk they decode
+    blocks.registry() # opened once per worker, chunks decode the same as on the loop
+
+def _timed_decode(data: bytes | memoryview, registry: BlockRegistry | None = None,
+                  light: bool = False) -> Tuple[Chunk, int]:
+    """Decodes a level_chunk_with_light packet after its id, also returning the nanoseconds it took"""
+    started = time.perf_counter_ns()
+    chunk = read_chunk(registry, BufferView(data), light)
+    return chunk, time.perf_counter_ns() - started
+
+def _decode_shared(name: str, size: int, light: bool) -> Tuple[Chunk, int]:
+    """Runs on a decode worker: decodes a packet from shared memory, the chunk copies what it keeps"""
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        return _timed_decode(memory.buf[:size], blocks.registry(), light)
+    finally:
+        memory.close()
+
+async def decode_chunk(data: bytes | memoryview, light: bool = False) -> Chunk:
+    """
+    Decodes a level_chunk_with_light packet (after its id) on the decode workers.
+    The packet is handed over in shared memory so only the decoded chunk is pickled.
+    Without spare cores a pool only adds overhead, so chunks are decoded on the loop one per
+    iteration instead, letting every packet received in between be handled first. So are they
+    in daemonic processes, which cannot start the workers.
+    """
+    if DECODE_WORKERS <= 0 or multiprocessing.current_process().daemon:
+        loop = asyncio.get_running_loop()
+        lock = _decode_locks.setdefault(loop, asyncio.Lock())
+        async with lock:
+            await asyncio.sleep(0) # poll the sockets before every chunk
+            chunk, nanos = _timed_decode(data, blocks.registry(), light)
+    else:
+        memory = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+        try:
+            memory.buf[:len(data)] = data
+            loop = asyncio.get_running_loop()
+            chunk, nanos = await loop.run_in_executor(decode_executor(), _decode_shared, memory.name, len(data), light)
+        finally:
+            memory.close()
+            memory.unlink()
+
+    chunk_load().record(nanos)
+    return chunk
+
+def unpack_section_position(value: int) -> Tuple[int, int, int]:
+    """Section coordinates packed into a long as x (22 bits), z (22 bits), y (20 bits)"""
+    x = value >> 42
+    y = ((value & 0xFFFFF) ^ 0x80000) - 0x80000 # sign extend the low 20 bits
+    z = (((value >> 20) & 0x3FFFFF) ^ 0x200000) - 0x200000
+    return x, y, z
+
+class ChunkStore:
+    """
+    Decoded chunks shared by every player in the process. Chunks are keyed by their coordinates
+    and a digest of the packet, so players standing in the same area decode each chunk once and
+    hold the same object.
+    Every acquire counts one holder and the chunk is dropped once every holder released it.
+    Stored chunks are read only: a world that applies an update to one first swaps it for its own
+    copy, since players receive updates at different times. Chunks decoded with and without
+    light are kept apart.
+    """
+    def __init__(self):
+        self._chunks: Dict[Tuple[int, int, bytes, bool], List] = {} # key to [chunk, holders]
+        self._keys: Dict[int, Tuple[int, int, bytes, bool]] = {} # id of a stored chunk to its key
+        self._decoding: Dict[Tuple[int, int, bytes, bool], asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._chunks)
+
+    @staticmethod
+    def key(data: bytes | memoryview, light: bool = False) -> Tuple[int, int, bytes, bool]:
+        """Chunk x, chunk z and a digest of a level_chunk_with_light packet after its id"""
+        x, = INT.unpack_from(data, 0)
+        z, = INT.unpack_from(data, 4)
+        return x, z, hashlib.blake2b(data, digest_size=16).digest(), light
+
+    def acquire(self, data: bytes | memoryview, light: bool = False) -> Chunk:
+        """Returns the stored chunk for the packet, decoding it only if nobody holds it yet"""
+        key = self.key(data, light)
+        entry = self._chunks.get(key)
+
+        if entry is None:
+            self.misses += 1
+            chunk, nanos = _timed_decode(data, blocks.registry(), light)
+            chunk_load().record(nanos)
+            entry = self._chunks[key] = [chunk, 0]
+            self._keys[id(chunk)] = key
+        else:
+            self.hits += 1
+
+        entry[1] += 1
+        return entry[0]
+
+    async def acquire_async(self, data: bytes | memoryview, light: bool = False) -> Chunk:
+        """Like acquire but decodes on the worker pool. Players waiting for the same packet share one decode"""
+        key = self.key(data, light)
+
+        if key not in self._chunks:
+            decoding = self._decoding.get(key)
+            if decoding is None:
+                self.misses += 1
+                decoding = self._decoding[key] = asyncio.ensure_future(decode_chunk(data, light))
+                decoding.add_done_callback(lambda _: self._decoding.pop(key, None))
+            else:
+                self.hits += 1
+
+            chunk = await asyncio.shield(decoding) # a cancelled waiter leaves the decode to the others
+            if key not in self._chunks:
+                self._chunks[key] = [chunk, 0]
+                self._keys[id(chunk)] = key
+        else:
+            self.hits += 1
+
+        entry = self._chunks[key]
+        entry[1] += 1
+        return entry[0]
+
+    def holds(self, chunk: Chunk) -> bool:
+        key = self._keys.get(id(chunk))
+        return key is not None and self._chunks[key][0] is chunk
+
+    def release(self, chunk: Chunk):
+        key = self._keys.get(id(chunk))
+        if key is None:
+            return # not from this store
+
+        entry = self._chunks[key]
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self._chunks[key]
+            del self._keys[id(chunk)]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(chunk.nbytes for chunk, _ in self._chunks.values())
+
+_store: ChunkStore | None = None
+
+def chunk_store() -> ChunkStore:
+    """The chunk store shared by every player of the process"""
+    global _store
+
+    if _store is None:
+        _store = ChunkStore()
+    return _store
+
+class World:
+    """
+    Chunks keyed by their chunk coordinates (block coordinates divided by 16 rounded down).
+    block_at answers a single position, blocks_at answers an (n, 3) array of positions with one
+    gather over every section they touch, which is what physics and pathfinding for many bots need.
+    Chunks that came from a store are released to it once the world drops them, or once the world
+    changes them, from which point it keeps a copy of its own.
+    Light is only read when light is set, otherwise chunks skip it and light updates are ignored.
+    """
+    def __init__(self, min_y: int = MIN_Y, store: ChunkStore | None = None, light: bool = False):
+        self.min_y = min_y
+        self.store = store
+        self.light = light
+        self.chunks: Dict[Tuple[int, int], Chunk] = {}
+        # updates for chunks still being decoded, replayed once they are installed
+        self._loading: Dict[Tuple[int, int], List[Callable[[], bool]]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def __contains__(self, key: Tuple[int, int]):
+        return key in self.chunks
+
+    def __iter__(self) -> Iterator[Chunk]:
+        return iter(self.chunks.values())
+
+    def add(self, chunk: Chunk):
+        previous = self.chunks.get((chunk.x, chunk.z))
+        self.chunks[(chunk.x, chunk.z)] = chunk
+
+        if previous is not None and self.store is not None:
+            self.store.release(previous)
+
+    def load(self, data: bytes | memoryview) -> asyncio.Task:
+        """
+        Decodes a level_chunk_with_light packet (after its id) on the worker pool and installs it
+        once ready, so the caller can keep handling packets in the meantime.
+        """
+        x, = INT.unpack_from(data, 0)
+        z, = INT.unpack_from(data, 4)
+        pending: List[Callable[[], bool]] = []
+        self._loading[(x, z)] = pending # a newer packet or a forget replaces or drops this
+
+        task = asyncio.create_task(self._load(x, z, pending, data), name=f"chunk {x},{z}")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _load(self, x: int, z: int, pending: List[Callable[[], bool]], data: bytes | memoryview):
+        try:
+            chunk = await (self.store.acquire_async(data, self.light) if self.store is not None
+                           else decode_chunk(data, self.light))
+        finally:
+            current = self._loading.get((x, z)) is pending
+            if current:
+                del self._loading[(x, z)]
+
+        if not current: # forgotten or sent again while decoding
+            if self.store is not None:
+                self.store.release(chunk)
+            return
+
+        self.add(chunk)
+        for update in pending:
+            update()
+
+    def _own(self, x: int, z: int) -> Chunk:
+        """The loaded chunk x, z, copied out of the store first if it is shared"""
+        chunk = self.chunks[(x, z)]
+        if self.store is None or not self.store.holds(chunk):
+            return chunk
+
+        copy = self.chunks[(x, z)] = chunk.copy()
+        self.store.release(chunk)
+        return copy
+
+    def remove(self, x: int, z: int) -> Chunk | None:
+        self._loading.pop((x, z), None)
+        chunk = self.chunks.pop((x, z), None)
+
+        if chunk is not None and self.store is not None:
+            self.store.release(chunk)
+        return chunk
+
+    def retain(self, x: int, z: int, radius: int):
+        """Drops every chunk, loaded or loading, further than radius chunks from chunk x, z"""
+        for key in [*self.chunks, *self._loading]:
+            if max(abs(key[0] - x), abs(key[1] - z)) > radius:
+                self.remove(*key)
+
+    def clear(self):
+        for task in self._tasks:
+            task.cancel()
+        self._loading.clear()
+
+        for x, z in list(self.chunks):
+            self.remove(x, z)
+
+    def chunk_at(self, x: int, z: int) -> Chunk | None:
+        """Chunk containing the block at x, z"""
+        return self.chunks.get((x >> 4, z >> 4))
+
+    def block_at(self, x: int, y: int, z: int) -> int:
+        """Global block state id at a world position, UNLOADED if its chunk is not loaded"""
+        chunk = self.chunks.get((x >> 4, z >> 4))
+        section = (y - self.min_y) >> 4
+
+        if chunk is None or not 0 <= section < len(chunk.sections):
+            return UNLOADED
+
+        return chunk.sections[section].block_at(x & 15, (y - self.min_y) & 15, z & 15)
+
+    def set_block(self, x: int, y: int, z: int, state: int) -> bool:
+        """Applies a block_update, returns whether the stored block changed"""
+        pending = self._loading.get((x >> 4, z >> 4))
+        if pending is not None:
+            pending.append(lambda: self.set_block(x, y, z, state))
+            return False
+
+        chunk = self.chunks.get((x >> 4, z >> 4))
+        section = (y - self.min_y) >> 4
+
+        if chunk is None or not 0 <= section < len(chunk.sections):
+            return False # the server also sends updates for chunks it has not sent yet
+
+        local_x, local_y, local_z = x & 15, (y - self.min_y) & 15, z & 15
+        if chunk.sections[section].block_at(local_x, local_y, local_z) == state:
+            return False
+
+        chunk = self._own(x >> 4, z >> 4)
+        xs, ys, zs, ids = np.array([local_x]), np.array([local_y]), np.array([local_z]), np.array([state])
+        chunk.set_blocks(section, xs, ys, zs, ids)
+        chunk.update_heightmaps(section, xs, ys, zs, ids, air_ids(blocks.registry()))
+        return True
+
+    def update_light(self, x: int, z: int, buff: Stream) -> bool:
+        """Applies the light data of a light_update for chunk x, z, returns whether the chunk is loaded"""
+        if not self.light:
+            return False
+
+        pending = self._loading.get((x, z))
+        if pending is not None:
+            data = buff.flush()
+            pending.append(lambda: self.update_light(x, z, BufferView(data)))
+            return False
+
+        if (x, z) not in self.chunks:
+            return False
+
+        chunk = self._own(x, z)
+        chunk.light = read_light(buff, chunk.light)
+        return True
+
+    def update_section(self, section: int, entries: Sequence[int]) -> bool:
+        """
+        Applies a section_blocks_update in one vectorized assignment.
+        section is the packed section position and every entry is state << 12 | x << 8 | z << 4 | y.
+        """
+        chunk_x, section_y, chunk_z = unpack_section_position(section)
+        pending = self._loading.get((chunk_x, chunk_z))
+        if pending is not None:
+            pending.append(lambda: self.update_section(section, entries))
+            return False
+
+        chunk = self.chunks.get((chunk_x, chunk_z))
+        index = section_y - (self.min_y >> 4)
+
+        if chunk is None or not 0 <= index < len(chunk.sections) or len(entries) == 0:
+            return False
+
+        packed = np.array(entries, dtype=np.int64)
+        x, y, z, ids = (packed >> 8) & 15, packed & 15, (packed >> 4) & 15, packed >> 12
+        if (chunk.sections[index].decoded()[y, z, x] == ids).all():
+            return False
+
+        chunk = self._own(chunk_x, chunk_z)
+        chunk.set_blocks(index, x, y, z, ids)
+
+        chunk.update_heightmaps(index, x, y, z, ids, air_ids(blocks.registry()))
+        return True
+
+    def light_at(self, x: int, y: int, z: int, sky: bool = True) -> int | None:
+        """Sky or block light level at a world position, None if it is not known"""
+        chunk = self.chunks.get((x >> 4, z >> 4))
+        if chunk is None or chunk.light is None:
+            return None
+
+        y -= self.min_y - 16 # the lowest light section is below the world
+        if not 0 <= y >> 4 < len(chunk.light.sky):
+            return None
+        return chunk.light.light_at(x & 15, y, z & 15, sky)
+
+    def surface_at(self, x: int, z: int, heightmap: str = "MOTION_BLOCKING") -> int | None:
+        """World y of the top block at x, z (min_y - 1 without blocks), None if the chunk is not loaded"""
+        chunk = self.chunks.get((x >> 4, z >> 4))
+        if chunk is None or heightmap not in chunk.heightmaps:
+            return None
+
+        return self.min_y + chunk.height(x & 15, z & 15, heightmap) - 1
+
+    def blocks_at(self, coords: np.ndarray) -> np.ndarray:
+        """
+        Global block state ids of an (n, 3) integer array of x, y, z world positions.
+        Every section touched is expanded once, stacked, and indexed with a single gather.
+        """
+        return gather_blocks([self], 0, coords)
+
+def gather_blocks(worlds: Sequence[World], owners: np.ndarray | int, coords: np.ndarray) -> np.ndarray:
+    """
+    World.blocks_at over several worlds at once, coords[i] being in worlds[owners[i]].
+    Every player has its own world, so this is how all of them are queried with one gather.
+    """
+    coords = np.asarray(coords, dtype=np.int64).reshape(-1, 3)
+    owners = np.broadcast_to(np.asarray(owners, dtype=np.int64), len(coords))
+    min_y = np.array([world.min_y for world in worlds], dtype=np.int64)
+    x, z = coords[:, 0], coords[:, 2]
+    y = coords[:, 1] - min_y[owners]
+    result = np.full(len(coords), UNLOADED, dtype=np.int32)
+
+    if len(coords) == 0:
+        return result
+
+    # one key per (chunk x, chunk z, section) so every section is looked up once
+    sections = np.clip(y >> 4, -1, 0x7FFF) & 0xFFFF # far out of range positions share a key
+    keys = ((x >> 4) << 40) + (((z >> 4) & 0xFFFFFF) << 16) + sections
+    if len(worlds) > 1: # numbers the keys of every world apart, sorting rows instead would be much slower
+        _, keys = np.unique(keys, return_inverse=True)
+        keys = owners * (int(keys.max()) + 1) + keys
+    unique, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+
+    stacked = np.empty((len(unique), 16, 16, 16), dtype=np.uint16)
+    loaded = np.zeros(len(unique), dtype=bool)
+
+    for index, row in enumerate(first.tolist()):
+        chunk = worlds[owners[row]].chunks.get((int(x[row]) >> 4, int(z[row]) >> 4))
+        section = int(y[row]) >> 4
+        if chunk is not None and 0 <= section < len(chunk.sections):
+            stacked[index] = chunk.section_blocks(section)
+            loaded[index] = True
+
+    found = loaded[inverse]
+    result[found] = stacked[inverse[found], y[found] & 15, z[found] & 15, x[found] & 15]
+    return result